@@ -0,0 +1,120 @@
+# Copyright 2013 Walter Scheper
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Hash files and byte streams from asyncio code."""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from concurrent.futures import Executor
+import asyncio
+import functools
+
+from hasher.hashes import CHUNK_SIZE, Hasher, HashResult, _discard
+
+# chunks smaller than this are hashed in the event loop, as handing them to
+# the executor costs more than hashing them
+OFFLOAD_SIZE = 64 * 1024
+
+
+async def _aiter(items: Iterable[str] | AsyncIterable[str]) -> AsyncIterator[str]:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class AsyncHasher:
+    """Calculate ``klass`` hashes without blocking the event loop.
+
+    Reading and hashing run in ``executor``, or the event loop's default
+    executor if it is ``None``, so one executor can be shared by every
+    ``AsyncHasher`` in a service. At most ``jobs`` files are hashed at once.
+    """
+
+    def __init__(
+        self,
+        klass: type[Hasher],
+        jobs: int = 4,
+        executor: Executor | None = None,
+        binary: bool = True,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> None:
+        if jobs < 1:
+            raise RuntimeError("jobs must be a positive integer")
+        self.klass = klass
+        self.jobs = jobs
+        self.executor = executor
+        self.binary = binary
+        self.hasher = klass(_discard, _discard)
+        self.hasher.chunk_size = chunk_size
+
+    async def hash_path(self, path: str) -> str:
+        """Return the digest of the file at ``path``."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self.hasher._hash_path, path, self.binary
+        )
+
+    async def hash_paths(
+        self, paths: Iterable[str] | AsyncIterable[str]
+    ) -> AsyncIterator[HashResult]:
+        """Yield a ``HashResult`` for each path, in order.
+
+        Paths are only taken from ``paths`` while fewer than ``jobs`` files
+        are being hashed, and no more are started until the oldest result has
+        been consumed.
+        """
+        loop = asyncio.get_running_loop()
+        hash_result = functools.partial(self.hasher._hash_result, binary=self.binary)
+        window: deque[asyncio.Future[HashResult]] = deque()
+        try:
+            async for path in _aiter(paths):
+                window.append(loop.run_in_executor(self.executor, hash_result, path))
+                if len(window) >= self.jobs:
+                    yield await window.popleft()
+            while window:
+                yield await window.popleft()
+        finally:
+            # the consumer stopped early, don't start what is still queued
+            for future in window:
+                future.cancel()
+
+    async def hash_stream(self, stream: AsyncIterable[bytes]) -> str:
+        """Return the digest of the bytes in ``stream``.
+
+        The next chunk is awaited while the previous one is being hashed, so
+        the chunks must not be changed after they are yielded.
+        """
+        if not self.klass.streaming:
+            raise RuntimeError(
+                f"{self.klass.name} hashes can't be calculated from a stream"
+            )
+        loop = asyncio.get_running_loop()
+        hasher = self.klass.hashlib()
+        pending: asyncio.Future[None] | None = None
+        async for chunk in stream:
+            if pending is not None:
+                await pending
+                pending = None
+            if len(chunk) < OFFLOAD_SIZE:
+                hasher.update(chunk)
+            else:
+                pending = loop.run_in_executor(self.executor, hasher.update, chunk)
+        if pending is not None:
+            await pending
+        return hasher.hexdigest()
@@ -14,18 +14,60 @@
 
 from __future__ import annotations
 
-from typing import Any
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Any
+import contextlib
 import functools
+import json
 import logging
+import os
+import sys
+import tempfile
 
 import click
 
+from hasher import bench as bench_
 from hasher.args import Args
-from hasher.hashes import Hasher, MD5Hasher, SHA1Hasher, SHA256Hasher
+from hasher.dupes import find_duplicates
+from hasher.hashes import (
+    CHUNK_SIZE,
+    HASHERS,
+    Hasher,
+    MultiHasher,
+    Writer,
+    load_plugins,
+)
+from hasher.layout import READ_ORDERS
+from hasher.output import BufferedWriter, exit_on_sigterm
+from hasher.pagecache import PAGE_CACHE_MODES
+from hasher.walk import walk
 
 log = logging.getLogger(__name__)
 
 
+class ByteSize(click.ParamType):
+    """A positive number of bytes, optionally with a K, M or G (binary) suffix."""
+
+    name = "size"
+    units = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+
+    def convert(
+        self, value: Any, param: click.Parameter | None, ctx: click.Context | None
+    ) -> int:
+        if isinstance(value, int):
+            return value
+        text = str(value).strip().lower().removesuffix("ib").removesuffix("b")
+        unit = text[-1:] if text[-1:] in self.units else ""
+        try:
+            size = int(text.removesuffix(unit)) * self.units[unit]
+        except ValueError:
+            self.fail(f"{value!r} is not a valid size", param, ctx)
+        if size < 1:
+            self.fail(f"{value!r} is not a positive size", param, ctx)
+        return size
+
+
 class AttrDict:
     def __init__(self, **kwargs):
         self.__dict__.update(kwargs)
@@ -90,95 +132,583 @@ hasher_options: list[tuple[list[str], dict[str, Any]]] = [
         ["--strict"],
         dict(is_flag=True, help="with --check, exit non-zero for any invalid input"),
     ),
+    (
+        ["--read-order"],
+        dict(
+            type=click.Choice(READ_ORDERS),
+            default="manifest",
+            show_default=True,
+            help="with --check, read files in the order of the checksum file, by "
+            "inode, or by where their data is on disk (extent), to reduce "
+            "seeking; output still follows the checksum file",
+        ),
+    ),
+    (
+        ["--checkpoint"],
+        dict(
+            default=None,
+            metavar="FILE",
+            type=click.Path(dir_okay=False, writable=True),
+            help="with --check, record progress in FILE every few seconds; it is "
+            "removed once every checksum file has been verified",
+        ),
+    ),
+    (
+        ["--resume"],
+        dict(
+            is_flag=True,
+            help="continue verifying from the --checkpoint FILE of an interrupted "
+            "run, if there is one",
+        ),
+    ),
+    (
+        ["-j", "--jobs"],
+        dict(
+            type=click.IntRange(min=1),
+            default=1,
+            show_default=True,
+            help="hash up to N files concurrently",
+        ),
+    ),
+    (
+        ["--executor"],
+        dict(
+            type=click.Choice(["thread", "process"]),
+            default="thread",
+            show_default=True,
+            help="run --jobs workers as threads or processes",
+        ),
+    ),
+    (
+        ["--chunk-size"],
+        dict(
+            type=ByteSize(),
+            default=CHUNK_SIZE,
+            show_default=True,
+            help="read files in pieces of SIZE bytes (K, M and G suffixes allowed)",
+        ),
+    ),
+    (
+        ["--mmap/--no-mmap"],
+        dict(
+            default=False,
+            help="memory-map regular files larger than --chunk-size in binary mode",
+        ),
+    ),
+    (
+        ["--cache"],
+        dict(
+            default=None,
+            envvar="HASHER_CACHE",
+            type=click.Path(dir_okay=False, writable=True),
+            help="reuse digests of unchanged files from the database FILE",
+        ),
+    ),
+    (
+        ["--xattr-cache"],
+        dict(
+            is_flag=True,
+            envvar="HASHER_XATTR_CACHE",
+            help="reuse digests of unchanged files from their user.hasher.* "
+            "extended attributes",
+        ),
+    ),
+    (
+        ["--no-cache"],
+        dict(is_flag=True, help="don't use the digest cache, even if one is set"),
+    ),
+    (
+        ["--refresh-cache"],
+        dict(is_flag=True, help="rehash every file and replace its cached digest"),
+    ),
+    (
+        ["--cache-max-age"],
+        dict(
+            type=click.FloatRange(min=0),
+            default=30,
+            show_default=True,
+            callback=lambda ctx, param, value: value * 86400,
+            metavar="DAYS",
+            help="evict cached digests that have not been used for DAYS",
+        ),
+    ),
+    (
+        ["--cache-max-entries"],
+        dict(
+            type=click.IntRange(min=1),
+            default=None,
+            metavar="N",
+            help="keep at most N of the most recently used cached digests",
+        ),
+    ),
+    (
+        ["-r", "--recursive"],
+        dict(
+            is_flag=True, help="hash the files in directories and their subdirectories"
+        ),
+    ),
+    (
+        ["--include"],
+        dict(
+            multiple=True,
+            metavar="GLOB",
+            help="with --recursive, only hash files matching GLOB. Can be repeated.",
+        ),
+    ),
+    (
+        ["--exclude"],
+        dict(
+            multiple=True,
+            metavar="GLOB",
+            help="with --recursive, skip files and directories matching GLOB. Can "
+            "be repeated.",
+        ),
+    ),
+    (
+        ["--sort/--no-sort"],
+        dict(
+            default=True,
+            show_default=True,
+            help="with --recursive, visit directory entries in name order instead "
+            "of the order they are found",
+        ),
+    ),
+    (
+        ["--files-from"],
+        dict(
+            default=None,
+            type=click.Path(exists=True, dir_okay=False, allow_dash=True),
+            help="also read the names of files to hash from FILE, one per line; if "
+            "FILE is -, read them from standard input",
+        ),
+    ),
+    (
+        ["-0", "--null"],
+        dict(is_flag=True, help="names read by --files-from are separated by NUL"),
+    ),
+    (
+        ["--stats"],
+        dict(
+            is_flag=True,
+            help="report the time spent opening, reading, hashing and writing files",
+        ),
+    ),
+    (
+        ["--stats-format"],
+        dict(
+            type=click.Choice(["text", "json"]),
+            default="text",
+            show_default=True,
+            help="format of the --stats report",
+        ),
+    ),
+    (
+        ["--stats-file"],
+        dict(
+            default=None,
+            type=click.Path(dir_okay=False, writable=True),
+            help="write the --stats report to FILE instead of stderr",
+        ),
+    ),
+    (
+        ["--archive"],
+        dict(
+            is_flag=True,
+            help="hash the files inside tar and zip archives, as "
+            "ARCHIVE!MEMBER; with --check, read each archive once",
+        ),
+    ),
+    (
+        ["--update"],
+        dict(
+            default=None,
+            metavar="MANIFEST",
+            type=click.Path(dir_okay=False, writable=True),
+            help="write the hashes to MANIFEST, only rehashing files that are new "
+            "or modified since it was written, and dropping files that are gone",
+        ),
+    ),
+    (
+        ["--page-cache"],
+        dict(
+            type=click.Choice(PAGE_CACHE_MODES),
+            default="keep",
+            show_default=True,
+            help="keep the files read in the page cache, drop them once hashed, "
+            "or bypass the cache with O_DIRECT where supported",
+        ),
+    ),
+    (
+        ["--max-rate"],
+        dict(
+            type=ByteSize(),
+            default=None,
+            help="read at most SIZE bytes per second, across all --jobs (K, M and "
+            "G suffixes allowed)",
+        ),
+    ),
+    (
+        ["--max-files-per-sec"],
+        dict(
+            type=click.FloatRange(min=0, min_open=True),
+            default=None,
+            metavar="RATE",
+            help="open at most RATE files per second, across all --jobs",
+        ),
+    ),
+    (
+        ["--progress"],
+        dict(
+            is_flag=True,
+            help="show the bytes and files hashed so far, the rate and an ETA on "
+            "stderr",
+        ),
+    ),
 ]
 
+
+@contextlib.contextmanager
+def _output() -> Iterator[tuple[Writer, Writer]]:
+    """Provide the stdout and stderr writers for a command.
+
+    Output to a terminal is written a line at a time, anything else is
+    buffered and flushed on exit, including on SIGTERM.
+    """
+    stderr = functools.partial(click.echo, err=True)
+    if sys.stdout.isatty():
+        yield click.echo, stderr
+        return
+
+    with exit_on_sigterm(), BufferedWriter(sys.stdout) as stdout:
+        yield stdout, stdout.flushing(stderr)
+
+
+def _check_directories(files: list[str], recursive: bool) -> None:
+    if recursive:
+        return
+    for fname in files:
+        if os.path.isdir(fname):
+            raise click.BadParameter(
+                f"File {click.format_filename(fname)!r} is a directory.",
+                param_hint="'[FILES]...'",
+            )
+
+
+# options that only apply when verifying checksums
+check_options = {
+    "--check",
+    "--quiet",
+    "--status",
+    "--warn",
+    "--strict",
+    "--read-order",
+    "--checkpoint",
+    "--resume",
+}
+# options that only apply to a single kind of hash
+single_options = {"--update", "--archive"}
+
 hasher_arguments: list[tuple[list[str], dict[str, Any]]] = [
     (
         ["files"],
         dict(
             nargs=-1,
-            type=click.Path(exists=True, dir_okay=False, allow_dash=True),
+            type=click.Path(exists=True, allow_dash=True),
         ),
     )
 ]
 
 
-@click.pass_context
-def md5(
-    ctx: click.Context,
-    files: list[str],
-    check: bool,
-    mode: str,
-    quiet: bool,
-    status: bool,
-    warn: bool,
-    strict: bool,
-) -> None:
-    _hasher(MD5Hasher, files, check, mode, quiet, status, warn, strict)
+def _command(klass: type[Hasher]) -> click.Command:
+    """Build the command that generates or checks ``klass`` hashes."""
 
+    @click.pass_context
+    def command(ctx: click.Context, files: list[str], mode: str, **options: Any):
+        ctx.exit(_hasher(klass, files, mode, **options))
+
+    for args, kwargs in hasher_arguments:
+        command = click.argument(*args, **kwargs)(command)
+    for args, kwargs in hasher_options:
+        command = click.option(*args, **kwargs)(command)
+    return hasher.command(
+        klass.name, help=klass.summary or f"Generate or check {klass.name} hashes"
+    )(command)
 
-@click.pass_context
-def sha1(
-    ctx: click.Context,
-    files: list[str],
-    check: bool,
-    mode: str,
-    quiet: bool,
-    status: bool,
-    warn: bool,
-    strict: bool,
-) -> None:
-    _hasher(SHA1Hasher, files, check, mode, quiet, status, warn, strict)
 
+def _split_algorithms(
+    ctx: click.Context, param: click.Parameter, value: str
+) -> list[str]:
+    algorithms = [name.strip().lower() for name in value.split(",") if name.strip()]
+    streaming = [name for name, klass in HASHERS.items() if klass.streaming]
+    unknown = [name for name in algorithms if name not in streaming]
+    if unknown:
+        raise click.BadParameter(
+            f"unknown hash {unknown[0]!r}, choose from {', '.join(streaming)}",
+            ctx,
+            param,
+        )
+    if not algorithms:
+        raise click.BadParameter("at least one hash is required", ctx, param)
+    # keep the first occurrence of each hash
+    return list(dict.fromkeys(algorithms))
 
+
+@click.option(
+    "-a",
+    "--algo",
+    "algorithms",
+    default="md5,sha1,sha256",
+    show_default=True,
+    callback=_split_algorithms,
+    help="comma separated list of hashes to calculate",
+)
+@click.option(
+    "-o",
+    "--output-dir",
+    default=None,
+    type=click.Path(file_okay=False, exists=True, writable=True),
+    help="write a NAMESUMS file for each hash to DIR instead of tagged lines to stdout",
+)
 @click.pass_context
-def sha256(
+def multi(
     ctx: click.Context,
     files: list[str],
-    check: bool,
     mode: str,
-    quiet: bool,
-    status: bool,
-    warn: bool,
-    strict: bool,
+    algorithms: list[str],
+    output_dir: str | None,
+    **options: Any,
 ) -> None:
-    _hasher(SHA256Hasher, files, check, mode, quiet, status, warn, strict)
+    _check_directories(files, options["recursive"])
+    args = Args(
+        files=files,
+        check=False,
+        binary=(mode == "binary"),
+        text=(mode == "text"),
+        quiet=False,
+        status=False,
+        warn=False,
+        strict=False,
+        **options,
+    )
+    with contextlib.ExitStack() as stack:
+        stdout, stderr = stack.enter_context(_output())
+        outputs: dict[str, Writer] = {}
+        if output_dir is not None:
+            # paths are written back the way they were decoded
+            encoding = sys.getfilesystemencoding()
+            for name in algorithms:
+                fobj = stack.enter_context(
+                    open(
+                        os.path.join(output_dir, f"{name.upper()}SUMS"),
+                        "w",
+                        encoding=encoding,
+                        errors="surrogateescape",
+                    )
+                )
+                outputs[name] = stack.enter_context(BufferedWriter(fobj))
+        hasher = MultiHasher(
+            stdout, stderr, [HASHERS[name] for name in algorithms], outputs
+        )
+        rc = hasher.take_action(args)
+    ctx.exit(rc)
 
 
-def _hasher(
-    klass: type[Hasher],
-    files: list[str],
-    check: bool,
-    mode: str,
-    quiet: bool,
-    status: bool,
-    warn: bool,
-    strict: bool,
-):
+def _hasher(klass: type[Hasher], files: list[str], mode: str, **options: Any) -> int:
+    _check_directories(files, options["recursive"])
     args = Args(
         files=files,
-        check=check,
         binary=(mode == "binary"),
         text=(mode == "text"),
-        quiet=quiet,
-        status=status,
-        warn=warn,
-        strict=strict,
+        **options,
     )
-    hasher = klass(click.echo, functools.partial(click.echo, err=True))
-    hasher.take_action(args)
+    with _output() as (stdout, stderr):
+        hasher = klass(stdout, stderr)
+        return hasher.take_action(args)
+
+
+@hasher.command(help="Benchmark hashing throughput on generated files")
+@click.option(
+    "-a",
+    "--algo",
+    "algorithms",
+    default="md5,sha1,sha256",
+    show_default=True,
+    callback=_split_algorithms,
+    help="comma separated list of hashes to benchmark",
+)
+@click.option(
+    "--corpus",
+    "corpora",
+    multiple=True,
+    type=click.Choice(bench_.CORPORA),
+    help="kind of files to hash. Can be repeated. [default: all]",
+)
+@click.option(
+    "--chunk-size",
+    "chunk_sizes",
+    multiple=True,
+    type=ByteSize(),
+    help=f"chunk size to read files with. Can be repeated. [default: {CHUNK_SIZE}]",
+)
+@click.option(
+    "--io",
+    "io_modes",
+    multiple=True,
+    type=click.Choice(bench_.IO_MODES),
+    help="how to read files. Can be repeated. [default: all]",
+)
+@click.option(
+    "--scale",
+    type=click.FloatRange(min=0, min_open=True),
+    default=1.0,
+    show_default=True,
+    help="multiply the number, or size, of the generated files by SCALE",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=3,
+    show_default=True,
+    help="report the fastest of N runs",
+)
+@click.option(
+    "--dir",
+    "directory",
+    type=click.Path(file_okay=False, exists=True, writable=True),
+    default=None,
+    help="generate files in a temporary directory under DIR",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.File("w"),
+    default=None,
+    help="write the results to FILE as JSON",
+)
+def bench(
+    algorithms: list[str],
+    corpora: tuple[str, ...],
+    chunk_sizes: tuple[int, ...],
+    io_modes: tuple[str, ...],
+    scale: float,
+    repeat: int,
+    directory: str | None,
+    output: IO[str] | None,
+) -> None:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="hasher-bench-", dir=directory) as root:
+        for result in bench_.run(
+            root,
+            corpora or bench_.CORPORA,
+            [HASHERS[name] for name in algorithms],
+            chunk_sizes or [CHUNK_SIZE],
+            io_modes or bench_.IO_MODES,
+            scale=scale,
+            repeat=repeat,
+        ):
+            click.echo(
+                f"{result.corpus:<8} {result.algorithm:<8} {result.chunk_size:>9} "
+                f"{result.io:<4} {result.mb_per_s:>10.2f} MB/s "
+                f"{result.files_per_s:>10.2f} files/s"
+            )
+            results.append(result)
+    peak = bench_.peak_rss_kib()
+    if peak is not None:
+        click.echo(f"peak RSS of all runs: {peak} KiB")
+    if output is not None:
+        json.dump(bench_.report(results), output, indent=2)
+        output.write("\n")
+
+
+def _algorithm(ctx: click.Context, param: click.Parameter, value: str) -> str:
+    name = value.strip().lower()
+    if name not in HASHERS:
+        raise click.BadParameter(
+            f"unknown hash {name!r}, choose from {', '.join(HASHERS)}", ctx, param
+        )
+    return name
+
+
+@hasher.command(
+    help="Find files with the same content\n\nDirectories in PATHS, or the "
+    "current directory, are searched recursively. Each set of duplicates is "
+    "written one path per line, with a blank line between sets."
+)
+@click.option(
+    "-a",
+    "--algo",
+    "algorithm",
+    default="sha256",
+    show_default=True,
+    callback=_algorithm,
+    help="hash to compare the content of files with",
+)
+@click.option(
+    "--min-size",
+    type=ByteSize(),
+    default=None,
+    help="skip files smaller than SIZE (K, M and G suffixes allowed)",
+)
+@click.option(
+    "--include",
+    multiple=True,
+    metavar="GLOB",
+    help="only compare files matching GLOB. Can be repeated.",
+)
+@click.option(
+    "--exclude",
+    multiple=True,
+    metavar="GLOB",
+    help="skip files and directories matching GLOB. Can be repeated.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="read up to N files concurrently",
+)
+@click.argument("paths", nargs=-1, type=click.Path(exists=True))
+def dupes(
+    algorithm: str,
+    min_size: int | None,
+    include: tuple[str, ...],
+    exclude: tuple[str, ...],
+    jobs: int,
+    paths: tuple[str, ...],
+) -> None:
+    with _output() as (stdout, stderr), contextlib.ExitStack() as stack:
+
+        def error(e: OSError) -> None:
+            stderr(f"hasher dupes: {e.filename}: {e.strerror}")
+
+        instance = HASHERS[algorithm](stdout, stderr)
+        if jobs > 1:
+            instance.jobs = jobs
+            instance.executor = stack.enter_context(ThreadPoolExecutor(jobs))
+        files = walk(paths or ["."], include=include, exclude=exclude, onerror=error)
+        for i, group in enumerate(
+            find_duplicates(instance, files, min_size or 0, onerror=error)
+        ):
+            if i:
+                stdout("")
+            for path in group:
+                stdout(path)
 
 
 for args, kwargs in hasher_arguments:
-    md5 = click.argument(*args, **kwargs)(md5)
-    sha1 = click.argument(*args, **kwargs)(sha1)
-    sha256 = click.argument(*args, **kwargs)(sha256)
+    multi = click.argument(*args, **kwargs)(multi)
 
 for args, kwargs in hasher_options:
-    md5 = click.option(*args, **kwargs)(md5)
-    sha1 = click.option(*args, **kwargs)(sha1)
-    sha256 = click.option(*args, **kwargs)(sha256)
+    if not (check_options | single_options).intersection(args):
+        multi = click.option(*args, **kwargs)(multi)
+
+_multi: click.Command = hasher.command(
+    help="Generate several kinds of hashes with one pass over each file"
+)(multi)
 
-_md5: click.Command = hasher.command(help="Generate or check md5 hashes")(md5)
-_sha1: click.Command = hasher.command(help="Generate or check sha1 hashes")(sha1)
-_sha256: click.Command = hasher.command(help="Generate or check sha256 hashes")(sha256)
+load_plugins()
+commands: dict[str, click.Command] = {
+    name: _command(klass) for name, klass in HASHERS.items()
+}
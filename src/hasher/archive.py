@@ -0,0 +1,104 @@
+# Copyright 2013 Walter Scheper
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Read the members of tar and zip archives in a single pass."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import IO
+import errno
+import lzma
+import os
+import sys
+import tarfile
+import zipfile
+import zlib
+
+# between the path of an archive and the name of a member
+SEPARATOR = "!"
+
+ZIP_ENCRYPTED = 0x1
+
+# raised for archives that are damaged or not archives at all
+ARCHIVE_ERRORS = (
+    tarfile.TarError,
+    zipfile.BadZipFile,
+    EOFError,
+    zlib.error,
+    lzma.LZMAError,
+)
+
+
+def member_path(archive: str, name: str) -> str:
+    return f"{archive}{SEPARATOR}{name}"
+
+
+def split_member(path: str) -> tuple[str, str] | None:
+    """Split ``archive!member`` at the first separator that follows the path
+    of an existing file, or return ``None`` if there is none."""
+    sep = path.find(SEPARATOR)
+    while sep > 0:
+        if os.path.isfile(path[:sep]):
+            return path[:sep], path[sep + 1 :]
+        sep = path.find(SEPARATOR, sep + 1)
+    return None
+
+
+def archive_error(archive: str, error: Exception) -> OSError:
+    return OSError(errno.EINVAL, f"Unreadable archive ({error})", archive)
+
+
+def iter_members(archive: str) -> Iterator[tuple[str, IO[bytes] | OSError]]:
+    """Yield the name and contents of each regular file in ``archive``, or the
+    error that makes a member unreadable on its own, such as encryption.
+
+    Zip archives are read in the order of their members on disk. Anything
+    else is read as a tar stream, compressed with any method ``tarfile``
+    supports, including from stdin when ``archive`` is ``-``. Each member is
+    only readable until the next one is requested.
+    """
+    if archive != "-" and zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as zf:
+            infos = sorted(zf.infolist(), key=lambda info: info.header_offset)
+            for info in infos:
+                if info.is_dir():
+                    continue
+                path = member_path(archive, info.filename)
+                if info.flag_bits & ZIP_ENCRYPTED:
+                    yield (
+                        info.filename,
+                        OSError(errno.EACCES, "Encrypted archive member", path),
+                    )
+                    continue
+                try:
+                    fobj = zf.open(info)
+                except NotImplementedError as e:
+                    # compressed with a method zipfile doesn't support
+                    yield info.filename, archive_error(path, e)
+                    continue
+                with fobj:
+                    yield info.filename, fobj
+        return
+
+    if archive == "-":
+        tf = tarfile.open(fileobj=sys.stdin.buffer, mode="r|*")
+    else:
+        tf = tarfile.open(archive, mode="r|*")
+    with tf:
+        for member in tf:
+            if member.isreg():
+                extracted = tf.extractfile(member)
+                if extracted is not None:
+                    yield member.name, extracted
@@ -13,3 +13,31 @@ class Args:
     status: bool
     warn: bool
     strict: bool
+    jobs: int = 1
+    executor: str = "thread"
+    chunk_size: int = 64 * 2048
+    mmap: bool = False
+    cache: str | None = None
+    xattr_cache: bool = False
+    no_cache: bool = False
+    refresh_cache: bool = False
+    cache_max_age: float | None = None
+    cache_max_entries: int | None = None
+    recursive: bool = False
+    include: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+    sort: bool = True
+    files_from: str | None = None
+    null: bool = False
+    stats: bool = False
+    stats_format: str = "text"
+    stats_file: str | None = None
+    progress: bool = False
+    update: str | None = None
+    read_order: str = "manifest"
+    page_cache: str = "keep"
+    max_rate: int | None = None
+    max_files_per_sec: float | None = None
+    checkpoint: str | None = None
+    resume: bool = False
+    archive: bool = False
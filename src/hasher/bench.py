@@ -0,0 +1,218 @@
+# Copyright 2013 Walter Scheper
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Throughput benchmarks for hashing files and verifying checksum files."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Sequence
+from dataclasses import asdict, dataclass, field
+from typing import Any
+import importlib.metadata
+import logging
+import os
+import platform
+import sys
+import time
+
+from hasher.args import Args
+from hasher.hashes import Hasher, _discard
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore[assignment]
+
+log = logging.getLogger(__name__)
+
+CORPORA = ("tiny", "huge", "tree", "manifest")
+IO_MODES = ("read", "mmap")
+
+
+@dataclass()
+class Corpus:
+    """A set of generated files to hash.
+
+    For the ``tree`` corpus, ``files`` is the top directory, hashed with
+    ``--recursive``. For the ``manifest`` corpus, a checksum file listing
+    ``files`` is written for each hash and verified with ``--check``.
+    """
+
+    name: str
+    files: list[str]
+    count: int
+    size: int
+    check: bool = False
+    recursive: bool = False
+
+
+@dataclass()
+class Result:
+    corpus: str
+    algorithm: str
+    chunk_size: int
+    io: str
+    files: int
+    bytes: int
+    seconds: float
+    mb_per_s: float = field(init=False)
+    files_per_s: float = field(init=False)
+
+    def __post_init__(self) -> None:
+        seconds = max(self.seconds, 1e-9)
+        self.mb_per_s = round(self.bytes / seconds / 1e6, 2)
+        self.files_per_s = round(self.files / seconds, 2)
+
+
+def peak_rss_kib() -> int | None:
+    """Return the peak resident set size of this process so far, in KiB.
+
+    This is the peak over every benchmark run so far, not of any one of them.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, everything else KiB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _write(path: str, size: int, seed: int) -> None:
+    block = (seed.to_bytes(8, "little") + os.urandom(4088)) * 16
+    with open(path, "wb") as fobj:
+        for _ in range(size // len(block)):
+            fobj.write(block)
+        fobj.write(block[: size % len(block)])
+
+
+def make_corpus(name: str, root: str, scale: float = 1.0) -> Corpus:
+    """Generate the files of corpus ``name`` in ``root``.
+
+    ``scale`` multiplies the number of files, or for ``huge``, their size.
+    """
+    top = os.path.join(root, name)
+    os.makedirs(top, exist_ok=True)
+    if name in ("tiny", "manifest"):
+        count, size = max(1, int(2000 * scale)), 1024
+        files = [os.path.join(top, f"{i:06d}.bin") for i in range(count)]
+        for i, path in enumerate(files):
+            _write(path, size, i)
+        return Corpus(name, files, count, count * size, check=(name == "manifest"))
+    if name == "huge":
+        count, size = 2, max(1, int(64 * 1024 * 1024 * scale))
+        files = [os.path.join(top, f"{i}.bin") for i in range(count)]
+        for i, path in enumerate(files):
+            _write(path, size, i)
+        return Corpus(name, files, count, count * size)
+    if name == "tree":
+        count, size = 0, 4096
+        levels = max(1, round(5 * min(scale, 1.0)))
+        dirs = [top]
+        for _ in range(levels):
+            dirs = [os.path.join(d, str(i)) for d in dirs for i in range(3)]
+            for d in dirs:
+                os.makedirs(d, exist_ok=True)
+                for i in range(4):
+                    _write(os.path.join(d, f"{i}.bin"), size, count)
+                    count += 1
+        return Corpus(name, [top], count, count * size, recursive=True)
+    raise ValueError(f"unknown corpus {name!r}")
+
+
+def _write_manifest(corpus: Corpus, klass: type[Hasher]) -> str:
+    hasher = klass(_discard, _discard)
+    # the digests never match, so every file is read and compared
+    digest = "0" * (2 * klass.hashlib().digest_size)
+    root = os.path.dirname(os.path.dirname(corpus.files[0]))
+    path = os.path.join(root, f"{klass.name}.sums")
+    with open(path, "w") as fobj:
+        fobj.writelines(
+            hasher.format_line(fname, digest, True) + "\n" for fname in corpus.files
+        )
+    return path
+
+
+def bench(
+    corpus: Corpus,
+    klass: type[Hasher],
+    chunk_size: int,
+    io: str,
+    repeat: int = 3,
+) -> Result:
+    """Hash ``corpus`` ``repeat`` times and return the fastest run."""
+    files = corpus.files
+    if corpus.check:
+        files = [_write_manifest(corpus, klass)]
+    args = Args(
+        files=files,
+        check=corpus.check,
+        binary=True,
+        text=False,
+        quiet=False,
+        status=corpus.check,
+        warn=False,
+        strict=False,
+        chunk_size=chunk_size,
+        mmap=(io == "mmap"),
+        recursive=corpus.recursive,
+    )
+    best = float("inf")
+    for _ in range(repeat):
+        hasher = klass(_discard, _discard)
+        start = time.perf_counter()
+        hasher.take_action(args)
+        best = min(best, time.perf_counter() - start)
+    return Result(
+        corpus.name,
+        klass.name,
+        chunk_size,
+        io,
+        corpus.count,
+        corpus.size,
+        best,
+    )
+
+
+def run(
+    root: str,
+    corpora: Sequence[str],
+    hashers: Sequence[type[Hasher]],
+    chunk_sizes: Sequence[int],
+    io_modes: Sequence[str],
+    scale: float = 1.0,
+    repeat: int = 3,
+) -> Iterator[Result]:
+    """Benchmark every combination of the given parameters."""
+    for name in corpora:
+        log.info("generating %s corpus in '%s'", name, root)
+        corpus = make_corpus(name, root, scale)
+        for klass in hashers:
+            for chunk_size in chunk_sizes:
+                for io in io_modes:
+                    yield bench(corpus, klass, chunk_size, io, repeat)
+
+
+def report(results: Sequence[Result]) -> dict[str, Any]:
+    """Describe ``results`` and the environment they were measured in."""
+    try:
+        version = importlib.metadata.version("hasher")
+    except importlib.metadata.PackageNotFoundError:
+        version = None
+    return {
+        "hasher": version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "peak_rss_kib": peak_rss_kib(),
+        "results": [asdict(result) for result in results],
+    }
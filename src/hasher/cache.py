@@ -0,0 +1,226 @@
+# Copyright 2013 Walter Scheper
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import annotations
+
+from typing import Any, Protocol
+import functools
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# files modified this recently may still change without moving their mtime
+RACY_NS = 2 * 10**9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS digests (
+    kind TEXT NOT NULL,
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (kind, device, inode)
+) WITHOUT ROWID
+"""
+
+
+def cacheable(st: os.stat_result) -> bool:
+    """Return true if a digest for the file described by ``st`` can be cached."""
+    return time.time_ns() - st.st_mtime_ns >= RACY_NS
+
+
+def same_file(a: os.stat_result, b: os.stat_result) -> bool:
+    return (a.st_dev, a.st_ino, a.st_size, a.st_mtime_ns) == (
+        b.st_dev,
+        b.st_ino,
+        b.st_size,
+        b.st_mtime_ns,
+    )
+
+
+class Cache(Protocol):
+    """Storage for digests of files that have not changed since they were hashed.
+
+    ``kind`` names the hash and read mode the digest was calculated with, so
+    that e.g. md5 digests of a file in text and binary mode are kept apart.
+    """
+
+    def get(self, fname: str, kind: str, st: os.stat_result) -> str | None: ...
+
+    def put(self, fname: str, kind: str, st: os.stat_result, digest: str) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class DigestCache:
+    """A SQLite database of digests keyed on (device, inode, size, mtime_ns).
+
+    The database is opened lazily, once per process: a cache sent to a worker
+    process becomes a single cache for that process, shared by every task it
+    runs. Entries that have not been used for
+    ``max_age`` seconds, and the least recently used entries beyond
+    ``max_entries``, are evicted when the cache is closed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        refresh: bool = False,
+        max_age: float | None = None,
+        max_entries: int | None = None,
+    ) -> None:
+        self.path = path
+        self.refresh = refresh
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (
+            _process_cache,
+            (self.path, self.refresh, self.max_age, self.max_entries),
+        )
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            log.debug("opening digest cache '%s'", self.path)
+            conn = sqlite3.connect(
+                self.path, timeout=60, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get(self, fname: str, kind: str, st: os.stat_result) -> str | None:
+        if self.refresh:
+            return None
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT digest FROM digests WHERE kind = ? AND device = ? "
+                "AND inode = ? AND size = ? AND mtime_ns = ?",
+                (kind, st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns),
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE digests SET used = ? WHERE kind = ? AND device = ? "
+                "AND inode = ?",
+                (int(time.time()), kind, st.st_dev, st.st_ino),
+            )
+        log.debug("using cached %s digest for '%s'", kind, fname)
+        return row[0]
+
+    def put(self, fname: str, kind: str, st: os.stat_result, digest: str) -> None:
+        if not cacheable(st):
+            return
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    kind,
+                    st.st_dev,
+                    st.st_ino,
+                    st.st_size,
+                    st.st_mtime_ns,
+                    digest,
+                    int(time.time()),
+                ),
+            )
+
+    def evict(self) -> None:
+        with self._lock:
+            if self.max_age is not None:
+                self.conn.execute(
+                    "DELETE FROM digests WHERE used < ?",
+                    (int(time.time() - self.max_age),),
+                )
+            if self.max_entries is not None:
+                self.conn.execute(
+                    "DELETE FROM digests WHERE (kind, device, inode) NOT IN "
+                    "(SELECT kind, device, inode FROM digests "
+                    "ORDER BY used DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+
+    def close(self) -> None:
+        # with a process pool, only the workers may have opened the database
+        if self._conn is None and self.max_age is None and self.max_entries is None:
+            return
+        self.evict()
+        with self._lock:
+            self.conn.close()
+            self._conn = None
+
+
+@functools.cache
+def _process_cache(
+    path: str, refresh: bool, max_age: float | None, max_entries: int | None
+) -> DigestCache:
+    return DigestCache(path, refresh, max_age, max_entries)
+
+
+class XattrCache:
+    """Store digests in ``user.hasher.<hash>`` extended attributes.
+
+    Each attribute holds the size and mtime the digest was calculated at, so
+    the cache stays with the file, including across renames. Files whose
+    attributes can't be read or written are simply hashed every time.
+    """
+
+    PREFIX = "user.hasher."
+
+    def __init__(self, refresh: bool = False) -> None:
+        if not hasattr(os, "setxattr"):
+            raise RuntimeError("extended attributes are not supported on this platform")
+        self.refresh = refresh
+
+    def _attribute(self, kind: str) -> str:
+        name, _, mode = kind.partition(":")
+        return self.PREFIX + name + ("" if mode == "binary" else f".{mode}")
+
+    def get(self, fname: str, kind: str, st: os.stat_result) -> str | None:
+        if self.refresh:
+            return None
+        try:
+            value = os.getxattr(fname, self._attribute(kind)).decode("ascii")
+            size, mtime_ns, digest = value.split(" ")
+            identity = (int(size), int(mtime_ns))
+        except (OSError, UnicodeDecodeError, ValueError):
+            return None
+        if identity != (st.st_size, st.st_mtime_ns):
+            return None
+        log.debug("using %s digest from extended attributes of '%s'", kind, fname)
+        return digest
+
+    def put(self, fname: str, kind: str, st: os.stat_result, digest: str) -> None:
+        if not cacheable(st):
+            return
+        value = f"{st.st_size} {st.st_mtime_ns} {digest}".encode("ascii")
+        try:
+            os.setxattr(fname, self._attribute(kind), value)
+        except OSError as e:
+            log.debug("unable to set extended attributes on '%s': %s", fname, e)
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,132 @@
+# Copyright 2013 Walter Scheper
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Record how far verifying checksum files got, so it can be resumed."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from typing import Any
+import contextlib
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+VERSION = 1
+# seconds between checkpoints
+INTERVAL = 10.0
+
+
+@dataclass(slots=True)
+class CheckState:
+    """How far a checksum file has been verified, and the errors so far."""
+
+    position: int = 0
+    format_errors: int = 0
+    hash_errors: int = 0
+    read_errors: int = 0
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.format_errors or self.hash_errors or self.read_errors)
+
+
+class Checkpoint:
+    """The ``CheckState`` of each checksum file, saved to ``path`` at most every
+    ``interval`` seconds.
+
+    With ``resume``, the states saved by an earlier run of the ``name`` hasher
+    are loaded, and a checksum file continues from its saved position unless
+    it has changed since.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        resume: bool = False,
+        interval: float = INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.path = path
+        self.name = name
+        self.interval = interval
+        self.clock = clock
+        self.manifests: dict[str, dict[str, Any]] = {}
+        self._current: tuple[str, dict[str, int], CheckState] | None = None
+        self._saved = clock()
+        if resume:
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as fobj:
+                data = json.load(fobj)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f"unable to read checkpoint {self.path}: {e}") from e
+        if data.get("version") != VERSION or data.get("hasher") != self.name:
+            raise RuntimeError(
+                f"checkpoint {self.path} was not written by the {self.name} command"
+            )
+        self.manifests = data["manifests"]
+
+    def start(self, fname: str) -> CheckState:
+        """Return the state to verify the checksum file ``fname`` from."""
+        self._current = None
+        try:
+            st = os.stat(fname)
+        except OSError:
+            # stdin, or a file that can't be read anyway
+            return CheckState()
+        key = os.path.abspath(fname)
+        identity = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        state = CheckState()
+        saved = self.manifests.get(key)
+        if saved is not None:
+            if saved["identity"] == identity:
+                state = CheckState(**saved["state"])
+            else:
+                log.warning("%s changed since the checkpoint, starting over", fname)
+        self._current = (key, identity, state)
+        return state
+
+    def update(self) -> None:
+        """Save the checkpoint if it is due."""
+        if self.clock() - self._saved >= self.interval:
+            self.save()
+
+    def save(self) -> None:
+        if self._current is not None:
+            key, identity, state = self._current
+            self.manifests[key] = {"identity": identity, "state": asdict(state)}
+        data = {"version": VERSION, "hasher": self.name, "manifests": self.manifests}
+        # replace the checkpoint in one step, so an interruption can't corrupt it
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fobj:
+            json.dump(data, fobj)
+            fobj.flush()
+            os.fsync(fobj.fileno())
+        os.replace(tmp, self.path)
+        self._saved = self.clock()
+
+    def remove(self) -> None:
+        """Forget the checkpoint, once every checksum file has been verified."""
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
@@ -0,0 +1,128 @@
+# Copyright 2013 Walter Scheper
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Find files with the same content, reading as little of them as possible."""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Callable, Hashable, Iterable, Iterator
+import functools
+import hashlib
+import itertools
+import logging
+import os
+import stat
+
+from hasher.hashes import Hasher
+
+log = logging.getLogger(__name__)
+
+SAMPLE_SIZE = 4096
+
+Inode = tuple[int, int]
+
+
+def _sample(size: int, path: str) -> bytes | OSError:
+    """Hash the first and last ``size`` bytes of the file at ``path``."""
+    sample = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, "rb") as fobj:
+            sample.update(fobj.read(size))
+            fobj.seek(-size, os.SEEK_END)
+            sample.update(fobj.read(size))
+    except OSError as e:
+        return e
+    return sample.digest()
+
+
+def _split(
+    groups: list[list[Inode]],
+    values: Iterable[Hashable | OSError],
+    onerror: Callable[[OSError], None] | None,
+) -> list[list[Inode]]:
+    """Split each group by the values of its inodes, given for all the groups
+    in order, keeping the parts that still collide."""
+    values = iter(values)
+    result: list[list[Inode]] = []
+    for group in groups:
+        parts: dict[Hashable, list[Inode]] = defaultdict(list)
+        for inode, value in zip(
+            group, itertools.islice(values, len(group)), strict=True
+        ):
+            if isinstance(value, OSError):
+                if onerror is not None:
+                    onerror(value)
+            else:
+                parts[value].append(inode)
+        result.extend(part for part in parts.values() if len(part) > 1)
+    return result
+
+
+def find_duplicates(
+    hasher: Hasher,
+    files: Iterable[str],
+    min_size: int = 0,
+    sample_size: int = SAMPLE_SIZE,
+    onerror: Callable[[OSError], None] | None = None,
+) -> list[list[str]]:
+    """Return the paths of each set of regular files with the same content.
+
+    Candidates are grouped by size, then for files larger than two samples by
+    a hash of their first and last ``sample_size`` bytes, and only files that
+    still collide are read in full by ``hasher``, using its worker pool if
+    one is active. Paths to the same inode, such as hard links, are read once
+    and count as one file, so a set is only reported if it has at least two
+    inodes. Files smaller than ``min_size`` are skipped.
+    """
+    paths: dict[Inode, list[str]] = {}
+    sizes: dict[int, list[Inode]] = defaultdict(list)
+    for path in files:
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            if onerror is not None:
+                onerror(e)
+            continue
+        if not stat.S_ISREG(st.st_mode) or st.st_size < min_size:
+            continue
+        inode = (st.st_dev, st.st_ino)
+        if inode in paths:
+            # the same path may be given more than once
+            if path not in paths[inode]:
+                paths[inode].append(path)
+        else:
+            paths[inode] = [path]
+            sizes[st.st_size].append(inode)
+
+    def first_paths(groups: list[list[Inode]]) -> Iterator[str]:
+        return (paths[inode][0] for group in groups for inode in group)
+
+    # when the sample would be the whole file, go straight to the digest
+    small = [g for size, g in sizes.items() if len(g) > 1 and size <= 2 * sample_size]
+    large = [g for size, g in sizes.items() if len(g) > 1 and size > 2 * sample_size]
+    log.info("sampling %d files of the same size", sum(map(len, large)))
+    sample = functools.partial(_sample, sample_size)
+    samples = (value for _, value in hasher.imap(sample, first_paths(large)))
+    groups = small + _split(large, samples, onerror)
+
+    log.info("hashing %d files", sum(map(len, groups)))
+    digests = (
+        result.digest if result.error is None else result.error
+        for result in hasher.hash_files(first_paths(groups), binary=True)
+    )
+    return sorted(
+        sorted(path for inode in group for path in paths[inode])
+        for group in _split(groups, digests, onerror)
+    )
@@ -14,7 +14,14 @@
 
 from __future__ import annotations
 
-from collections.abc import Callable, Iterator
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
 from re import Pattern
 from typing import (
     IO,
@@ -22,30 +29,190 @@ from typing import (
     Any,
     ClassVar,
     Protocol,
+    TypeVar,
     cast,
 )
+import contextlib
+import contextvars
+import dataclasses
+import errno
+import functools
 import hashlib
+import importlib
+import importlib.metadata
+import io
+import itertools
 import logging
+import mmap
 import os
 import re
+import stat
 import sys
+import time
 
+from hasher.archive import (
+    ARCHIVE_ERRORS,
+    archive_error,
+    iter_members,
+    member_path,
+    split_member,
+)
 from hasher.args import Args
+from hasher.cache import RACY_NS, Cache, DigestCache, XattrCache, same_file
+from hasher.checkpoint import Checkpoint, CheckState
+from hasher.layout import FIRST, read_key, resequence
+from hasher.pagecache import advise, direct_chunks, dropping, regular_fd
+from hasher.progress import REPORT_BYTES, Progress
+from hasher.stats import FileStats, Stats
+from hasher.throttle import TokenBucket
+from hasher.walk import read_paths, walk
 
 if TYPE_CHECKING:
     Hash = hashlib._Hash
 else:
     Hash = None
 
+# the name and digest, or read error, of each member of an archive, and the
+# error that stopped it being read
+ArchiveDigests = tuple[list[tuple[str, str | OSError]], OSError | None]
+
+# (line index, (digest, binary, path) or None for a malformed line)
+CheckEntry = tuple[int, tuple[bytes, bool, str] | None]
+
+# ((archive, binary) or None, [(entry, member name or None), ...]): consecutive
+# lines naming members of the same archive, or a single other line
+ArchiveRun = tuple[tuple[str, bool] | None, list[tuple[CheckEntry, str | None]]]
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
 
 FORMAT_ERROR = "MISFORMATTED"
 HASH_ERROR = "FAILED"
 READ_ERROR = "FAILED open or read"
 SUCCESS = "OK"
-EXCLUDES = ("base.py", "__init__.py")
-PATH = os.path.dirname(__file__)
-PYEXT = ".py"
 STATUS_MSG = "{0}: {1}"
+CHUNK_SIZE = 64 * 2048
+MANIFEST_BLOCK_SIZE = 1024 * 1024
+
+
+# the stats of the file being hashed in this thread, if anyone is listening
+_file_stats: contextvars.ContextVar[FileStats | None] = contextvars.ContextVar(
+    "file_stats", default=None
+)
+
+# called with the name and ``FileStats`` of each file once its output is written
+Hook = Callable[[str, FileStats], None]
+
+
+def _discard(
+    message: Any | None = None,
+    file: IO[Any] | None = None,
+    nl: bool = True,
+    err: bool = False,
+    color: bool | None = None,
+) -> None:
+    pass
+
+
+def _is_stdin(fname: str) -> bool:
+    return fname == "-"
+
+
+def _parse_check_line(line: bytes, width: int) -> tuple[bytes, bool, str] | None:
+    """Parse a stripped ``<hex digest> <' ' or '*'><path>`` checksum line."""
+    if (
+        len(line) <= width + 2
+        or line[width] != 0x20
+        or line[width + 1] not in b" *"
+        or line[:width].translate(None, b"0123456789abcdef")
+    ):
+        return None
+    return (
+        bytes.fromhex(line[:width].decode("ascii")),
+        line[width + 1] == 0x2A,
+        os.fsdecode(line[width + 2 :]),
+    )
+
+
+def _timed_call(func: Callable[[T], R], item: T) -> tuple[R, FileStats]:
+    file_stats = FileStats()
+    token = _file_stats.set(file_stats)
+    try:
+        return func(item), file_stats
+    finally:
+        _file_stats.reset(token)
+
+
+def _temp_path(path: str) -> str:
+    return f"{path}.{os.getpid()}.tmp"
+
+
+@contextlib.contextmanager
+def _replace_file(path: str, mtime_ns: int | None = None) -> Iterator[IO[str]]:
+    """Write a new version of ``path`` that replaces it only once complete,
+    optionally with its modification time set to ``mtime_ns``."""
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666
+    tmp = _temp_path(path)
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode)
+    try:
+        # paths are written back the way they were decoded
+        encoding = sys.getfilesystemencoding()
+        with open(fd, "w", encoding=encoding, errors="surrogateescape") as fobj:
+            yield fobj
+            fobj.flush()
+            os.fsync(fobj.fileno())
+        if mtime_ns is not None:
+            os.utime(tmp, ns=(mtime_ns, mtime_ns))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _read_key(order: str, entry: CheckEntry) -> tuple[int, int, int, int]:
+    if entry[1] is None or entry[1][2] == "-":
+        return FIRST
+    return read_key(order, entry[1][2])
+
+
+def _archive_runs(entries: Iterable[CheckEntry]) -> Iterator[ArchiveRun]:
+    run: list[tuple[CheckEntry, str | None]] = []
+    source: tuple[str, bool] | None = None
+    for entry in entries:
+        _, record = entry
+        member = None if record is None else split_member(record[2])
+        if member is None or record is None:
+            if run:
+                yield source, run
+                run = []
+            yield None, [(entry, None)]
+            continue
+        if run and (member[0], record[1]) != source:
+            yield source, run
+            run = []
+        source = (member[0], record[1])
+        run.append((entry, member[1]))
+    if run:
+        yield source, run
+
+
+def _run_path(item: ArchiveRun) -> str | None:
+    """The path of the file a run reads, or ``None`` for a malformed line."""
+    source, run = item
+    if source is not None:
+        return source[0]
+    (_, record), _ = run[0]
+    return None if record is None else record[2]
+
+
+def _reads_stdin(entry: CheckEntry) -> bool:
+    # worker processes have no access to our stdin
+    return entry[1] is not None and entry[1][2] == "-"
 
 
 class Writer(Protocol):
@@ -59,6 +226,76 @@ class Writer(Protocol):
     ) -> None: ...
 
 
+@dataclasses.dataclass(frozen=True, slots=True)
+class HashResult:
+    """The outcome of hashing, or verifying, one file.
+
+    ``status`` is ``SUCCESS``, ``READ_ERROR`` with the ``error`` that was
+    raised, or when verifying, ``HASH_ERROR`` if ``digest`` doesn't match the
+    ``expected`` one. Improperly formatted lines of a checksum file are
+    reported with the name of the checksum file and ``FORMAT_ERROR``. ``line``
+    is the line of the checksum file that listed the file.
+    """
+
+    path: str
+    status: str
+    digest: bytes | None = None
+    algorithm: str = ""
+    binary: bool = False
+    expected: bytes | None = None
+    error: OSError | None = None
+    line: int | None = None
+
+    @property
+    def hexdigest(self) -> str:
+        return "" if self.digest is None else self.digest.hex()
+
+    @property
+    def ok(self) -> bool:
+        return self.status == SUCCESS
+
+
+class NewlineReader:
+    """Read a binary file with ``\\r\\n`` and ``\\r`` line endings turned into
+    ``\\n``, the way text mode hashes files.
+
+    Chunks without a ``\\r`` are returned as they are read, so this costs
+    little more than reading the file in binary mode, and the content is
+    never decoded.
+    """
+
+    def __init__(self, raw: IO[bytes]) -> None:
+        self.raw = raw
+        # the last chunk ended in a \r, so a leading \n belongs to it
+        self._cr = False
+
+    def __enter__(self) -> NewlineReader:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.raw.close()
+
+    def fileno(self) -> int:
+        return self.raw.fileno()
+
+    def read(self, size: int = -1) -> bytes:
+        while True:
+            data = self.raw.read(size)
+            if self._cr and data[:1] == b"\n":
+                data = data[1:]
+                self._cr = False
+                if not data:
+                    # only the \n was read, there may be more to come
+                    continue
+            self._cr = data[-1:] == b"\r"
+            if b"\r" not in data:
+                return data
+            return data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+
 class Hasher:
     """Base class for various sub-classes that implement specific hashing
     algorithms."""
@@ -66,75 +303,353 @@ class Hasher:
     CHECK_RE: ClassVar[Pattern]
     hashlib: ClassVar[Callable[..., Hash]]
     name: ClassVar[str]
+    summary: ClassVar[str | None] = None
+    # whether the digest can be calculated by feeding chunks to ``hashlib()``
+    streaming: ClassVar[bool] = True
 
     log: ClassVar[logging.Logger] = logging.getLogger(__name__)
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # the width of the digests to check comes from the digest size
+        if "CHECK_RE" not in cls.__dict__ and "hashlib" in cls.__dict__:
+            width = 2 * cls.hashlib().digest_size
+            cls.CHECK_RE = re.compile(rf"^([a-f0-9]{{{width}}}) (\*| )(.+)$")
+
     def __init__(self, stdout: Writer, stderr: Writer) -> None:
-        self.chunk_size = 64 * 2048
+        self.chunk_size = CHUNK_SIZE
         self.stdout = stdout
         self.stderr = stderr
+        self.executor: Executor | None = None
+        self.jobs = 1
+        self.use_mmap = False
+        self.page_cache = "keep"
+        self.max_rate: TokenBucket | None = None
+        self.max_files: TokenBucket | None = None
+        self.checkpoint: Checkpoint | None = None
+        self.cache: Cache | None = None
+        self.hooks: list[Hook] = []
+        self.progress: Progress | None = None
+        # whether a file, or directory, couldn't be read while generating
+        self.read_failed = False
+
+    def __getstate__(self) -> dict[str, Any]:
+        # worker processes only need enough state to hash files
+        state = self.__dict__.copy()
+        state.update(
+            executor=None, stdout=_discard, stderr=_discard, hooks=[], progress=None
+        )
+        return state
 
     def _calculate_hash(self, file_object: IO) -> str:
         """Calculate a hash value for the data in ``file_object."""
         hasher = self.hashlib()
-        for chunk in self.iterchunks(file_object):
+        for chunk in self._chunks(file_object):
             hasher.update(chunk)
         return hasher.hexdigest()
 
+    def _check_entry(self, entry: CheckEntry) -> str | OSError | None:
+        """Hash the file named by a parsed checksum line.
+
+        Returns ``None`` if the line was malformed, or the ``OSError`` if the
+        file could not be read.
+        """
+        _, record = entry
+        if record is None:
+            return None
+        _, binary, check_file = record
+        return self._try_hash_path(check_file, binary)
+
+    def _chunks(self, file_object: IO) -> Iterator[bytes | memoryview]:
+        """Like ``iterchunks``, but keeping to ``max_rate`` if it is set, and
+        timing the reads if stats are being kept."""
+        chunks = self.iterchunks(file_object)
+        if self.max_rate is not None:
+            chunks = self.max_rate.throttle(chunks)
+        file_stats = _file_stats.get()
+        if file_stats is None:
+            return chunks
+        return self._timed_chunks(chunks, file_stats)
+
+    def _timed_chunks(
+        self, chunks: Iterator[bytes | memoryview], file_stats: FileStats
+    ) -> Iterator[bytes | memoryview]:
+        # the time until the next chunk is requested is spent hashing this one
+        clock = time.perf_counter_ns
+        progress = self.progress
+        pending = 0
+        while True:
+            start = clock()
+            chunk = next(chunks, None)
+            read = clock()
+            file_stats.read_ns += read - start
+            if chunk is None:
+                return
+            file_stats.bytes += len(chunk)
+            if progress is not None:
+                pending += len(chunk)
+                if pending >= REPORT_BYTES:
+                    progress.add(pending)
+                    file_stats.reported += pending
+                    pending = 0
+            yield chunk
+            file_stats.hash_ns += clock() - read
+
+    @classmethod
+    def _cache_kind(cls, binary: bool) -> str:
+        return f"{cls.name}:{'binary' if binary else 'text'}"
+
+    def _close(self) -> None:
+        """Shut down the worker pool and cache set up by ``take_action``."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    def _hash_path(self, fname: str, binary: bool = False) -> str:
+        fobj = self._open_timed(fname, binary)
+        try:
+            if self.cache is None or _is_stdin(fname):
+                return self._calculate_hash(fobj)
+
+            st = os.fstat(fobj.fileno())
+            kind = self._cache_kind(binary)
+            hash_value = self.cache.get(fname, kind, st)
+            if hash_value is None:
+                hash_value = self._calculate_hash(fobj)
+                if same_file(st, os.fstat(fobj.fileno())):
+                    self.cache.put(fname, kind, st, hash_value)
+            return hash_value
+        finally:
+            if not _is_stdin(fname):
+                fobj.close()
+
     def _open_file(self, fname: str, binary: bool = False) -> IO:
-        if fname == "-":
-            return sys.stdin
-        return open(fname, "rb" if binary else "r")
+        fobj = sys.stdin.buffer if fname == "-" else open(fname, "rb")
+        return fobj if binary else cast(IO, NewlineReader(fobj))
 
-    def check_hash(self, fname: str, args: Args) -> int:
-        """Check the hashed values in files against the calculated values.
+    def _open_timed(self, fname: str, binary: bool = False) -> IO:
+        if self.max_files is not None:
+            self.max_files.take(1)
+        file_stats = _file_stats.get()
+        if file_stats is None:
+            return self._open_file(fname, binary)
+        start = time.perf_counter_ns()
+        try:
+            return self._open_file(fname, binary)
+        finally:
+            file_stats.open_ns += time.perf_counter_ns() - start
 
-        Returns a list and a tuple of error counts.
+    def _parse_check_file(self, file_object: IO) -> Iterator[CheckEntry]:
+        """Parse the lines of a checksum file.
 
-        list: [(fname, 'OK' or 'FAILED' or 'FAILED open or read'),...]
-        Error counts: (format_erros, hash_errors, read_errors)
+        Yields ``(index, (digest, binary, path))`` for each line, or
+        ``(index, None)`` for lines that are improperly formatted.
         """
-        fobj = self._open_file(fname, args.binary)
+        if isinstance(file_object, (io.BufferedIOBase, io.RawIOBase)):
+            yield from self._parse_check_blocks(file_object)
+            return
 
-        rc = 0
-        format_errors = 0
-        hash_errors = 0
-        read_errors = 0
-        for idx, line in enumerate(fobj):
+        for idx, line in enumerate(file_object):
             # remove any newline characters
             m = self.CHECK_RE.match(line.strip())
-            if not m:
-                if args.warn:
-                    self.stderr(
-                        f"hasher {self.name}: {fname}: {idx + 1}: improperly formatted "
-                        f"{self.name.upper()} checksum line"
-                    )
-                format_errors += 1
-                rc = 1
-                continue
-            hash_value, binary, check_file = m.groups()
+            if m is None:
+                yield idx, None
+            else:
+                hash_value, binary, check_file = m.groups()
+                yield idx, (bytes.fromhex(hash_value), binary == "*", check_file)
+
+    def _parse_check_blocks(self, file_object: IO[bytes]) -> Iterator[CheckEntry]:
+        """Parse a binary checksum file a block at a time, without a regex.
+
+        Accepts exactly the lines ``CHECK_RE`` does, with paths decoded using
+        the filesystem encoding.
+        """
+        width = 2 * self.hashlib().digest_size
+        idx = 0
+        pending = b""
+        while True:
+            block = file_object.read(MANIFEST_BLOCK_SIZE)
+            lines = (pending + block).split(b"\n")
+            pending = lines.pop() if block else b""
+            for line in lines:
+                if line or block:
+                    yield idx, _parse_check_line(line.strip(), width)
+                idx += 1
+            if not block:
+                return
+
+    def _read_check_file(self, fname: str) -> Iterator[CheckEntry]:
+        fobj = self._open_file(fname, binary=True)
+        if _is_stdin(fname):
+            yield from self._parse_check_file(fobj)
+            return
+        with fobj:
+            yield from self._parse_check_file(fobj)
 
+    def _read_error(self, fname: str, error: OSError) -> None:
+        self.read_failed = True
+        self.stderr(f"hasher {self.name}: {fname}: {error.strerror}")
+
+    def _hash_result(self, fname: str, binary: bool = False) -> HashResult:
+        try:
+            digest = bytes.fromhex(self._hash_path(fname, binary))
+        except OSError as e:
+            return HashResult(fname, READ_ERROR, None, self.name, binary, error=e)
+        return HashResult(fname, SUCCESS, digest, self.name, binary)
+
+    def _try_hash_archive(self, source: tuple[str, bool]) -> ArchiveDigests:
+        """Hash the regular files in the archive ``source`` names, in text or
+        binary mode, returning their names and digests, and the error that
+        stopped the archive being read, if any."""
+        archive, binary = source
+        if self.max_files is not None:
+            self.max_files.take(1)
+        digests: list[tuple[str, str | OSError]] = []
+        try:
+            for name, fobj in iter_members(archive):
+                if isinstance(fobj, OSError):
+                    digests.append((name, fobj))
+                    continue
+                member = fobj if binary else cast(IO, NewlineReader(fobj))
+                digests.append((name, self._calculate_hash(member)))
+        except OSError as e:
+            return digests, e
+        except ARCHIVE_ERRORS as e:
+            return digests, archive_error(archive, e)
+        return digests, None
+
+    def _try_hash_path(self, fname: str, binary: bool = False) -> str | OSError:
+        try:
+            return self._hash_path(fname, binary)
+        except OSError as e:
+            return e
+
+    def _write_stats(self, stats: Stats, args: Args) -> None:
+        summary = stats.format(args.stats_format)
+        if args.stats_file is None:
+            self.stderr(summary)
+            return
+        with open(args.stats_file, "w") as fobj:
+            fobj.write(summary + "\n")
+
+    def _sizes(self, args: Args) -> Iterator[int]:
+        """Yield the size of each file ``args`` will hash, as far as it can be
+        known in advance."""
+        paths: Iterable[str]
+        if args.check and args.archive:
+            # each run of lines in the same archive is read as one file
+            entries = (
+                entry for fname in args.files for entry in self._read_check_file(fname)
+            )
+            paths = (
+                path
+                for path in map(_run_path, _archive_runs(entries))
+                if path is not None
+            )
+        elif args.check:
+            paths = (
+                record[2]
+                for fname in args.files
+                for _, record in self._read_check_file(fname)
+                if record is not None
+            )
+        elif args.recursive:
+            paths = walk(
+                args.files, include=args.include, exclude=args.exclude, sort=False
+            )
+        else:
+            paths = args.files
+        for path in paths:
             try:
-                check_f = open(check_file, "rb" if binary == "*" else "r")
+                yield os.stat(path).st_size
             except OSError:
-                self.stderr(
-                    f"hasher {self.name}: {check_file}: No such file or directory"
-                )
-                if not args.status:
-                    self.stdout(STATUS_MSG.format(check_file, READ_ERROR))
-                read_errors += 1
-                rc = 1
-                continue
+                yield 0
 
-            if self._calculate_hash(check_f) == hash_value:
-                if not (args.quiet or args.status):
-                    self.stdout(STATUS_MSG.format(check_file, SUCCESS))
-            else:
-                if not args.status:
-                    self.stdout(STATUS_MSG.format(check_file, HASH_ERROR))
-                hash_errors += 1
-                rc = 1
+    def _start_progress(self, stack: contextlib.ExitStack, args: Args) -> None:
+        rewrite = sys.stderr.isatty()
+        write = functools.partial(self.stderr, nl=False) if rewrite else self.stderr
+        progress = self.progress = Progress(write, rewrite=rewrite)
+        self.add_hook(progress)
+        # names read from stdin, or from a list, can only be read once
+        if args.files_from is None and "-" not in args.files:
+            progress.size(self._sizes(args))
+        stack.callback(setattr, self, "progress", None)
+        stack.callback(self.hooks.remove, progress)
+        stack.callback(progress.close)
+
+    def _load_manifest(self, manifest: str) -> dict[str, tuple[bytes, bool]]:
+        """Map each path listed in ``manifest`` to its digest and mode."""
+        known = {}
+        for _, record in self._read_check_file(manifest):
+            if record is not None:
+                digest, binary, path = record
+                known[path] = (digest, binary)
+        return known
 
+    def _reuse_or_hash(
+        self, item: tuple[str, bytes | None], binary: bool = False
+    ) -> HashResult:
+        fname, digest = item
+        if digest is None:
+            return self._hash_result(fname, binary)
+        return HashResult(fname, SUCCESS, digest, self.name, binary)
+
+    def _walk_error(self, error: OSError) -> None:
+        self.read_failed = True
+        self.stderr(f"hasher {self.name}: {error.filename}: {error.strerror}")
+
+    def check_hash(self, fname: str, args: Args) -> int:
+        """Check the hashed values in files against the calculated values.
+
+        Returns a list and a tuple of error counts.
+
+        list: [(fname, 'OK' or 'FAILED' or 'FAILED open or read'),...]
+        Error counts: (format_erros, hash_errors, read_errors)
+
+        With a ``checkpoint``, verifying continues from where it was saved,
+        with the errors found before, and the state is saved as it goes.
+        """
+        checkpoint = self.checkpoint
+        state = CheckState() if checkpoint is None else checkpoint.start(fname)
+        try:
+            for result in self.verify(
+                fname, args.read_order, state.position, args.archive
+            ):
+                if result.status == FORMAT_ERROR:
+                    if args.warn:
+                        self.stderr(
+                            f"hasher {self.name}: {fname}: {result.line}: "
+                            f"improperly formatted {self.name.upper()} checksum line"
+                        )
+                    state.format_errors += 1
+                elif result.status == READ_ERROR:
+                    error = result.error
+                    # errors without a description get the historical message
+                    strerror = (error and error.strerror) or os.strerror(errno.ENOENT)
+                    self.stderr(f"hasher {self.name}: {result.path}: {strerror}")
+                    if not args.status:
+                        self.stdout(STATUS_MSG.format(result.path, READ_ERROR))
+                    state.read_errors += 1
+                elif result.ok:
+                    if not (args.quiet or args.status):
+                        self.stdout(STATUS_MSG.format(result.path, SUCCESS))
+                else:
+                    if not args.status:
+                        self.stdout(STATUS_MSG.format(result.path, HASH_ERROR))
+                    state.hash_errors += 1
+                state.position += 1
+                if checkpoint is not None:
+                    checkpoint.update()
+        finally:
+            if checkpoint is not None:
+                checkpoint.save()
+
+        format_errors = state.format_errors
+        read_errors = state.read_errors
+        hash_errors = state.hash_errors
         if format_errors and not args.status:
             lines = "line" + ("s" if format_errors > 1 else "")
             are = "are" if format_errors > 1 else "is"
@@ -154,20 +669,412 @@ class Hasher:
                 f"hasher {self.name}: WARNING: {hash_errors} computed {checksums} "
                 "did NOT match"
             )
-        return rc
+        return int(state.failed)
+
+    def format_line(self, fname: str, hash_value: str, binary: bool) -> str:
+        line = f"{hash_value} {'*' if binary else ' '}{fname}"
+
+        if "//" in line:
+            line = "//" + line.replace("//", "////")
+        return line
 
     def generate_hash(self, fname: str, args: Args) -> None:
         """Generate hashes for files."""
-        fobj = self._open_file(fname, args.binary)
-        hash_value = self._calculate_hash(fobj)
+        hash_value = self._hash_path(fname, args.binary)
+        self.stdout(self.format_line(fname, hash_value, args.binary))
 
-        line = f"{hash_value} {'*' if args.binary else ' '}{fname}"
+    def generate_archives(self, files: Iterable[str], args: Args) -> None:
+        """Generate hashes for the members of archives, named ``archive!member``,
+        using the worker pool if active."""
+        sources = ((fname, args.binary) for fname in files)
+        for (archive, binary), (digests, error), file_stats in self._imap_files(
+            self._try_hash_archive, sources, inline=lambda source: _is_stdin(source[0])
+        ):
+            start = time.perf_counter_ns()
+            failed = error is not None
+            for name, digest in digests:
+                path = member_path(archive, name)
+                if isinstance(digest, OSError):
+                    self._read_error(path, digest)
+                    failed = True
+                else:
+                    self.stdout(self.format_line(path, digest, binary))
+            if error is not None:
+                self._read_error(archive, error)
+            # the hooks hear about the archive, the file that was read
+            if file_stats is not None:
+                file_stats.error = failed
+                self._run_hooks(archive, file_stats, start)
 
-        if "//" in line:
-            line = "//" + line.replace("//", "////")
-        self.stdout(line)
+    def generate_hashes(self, files: Iterable[str], args: Args) -> None:
+        """Generate hashes for many files, using the worker pool if active."""
+        for result in self.hash_files(files, args.binary):
+            if result.error is not None:
+                self._read_error(result.path, result.error)
+            else:
+                self.stdout(
+                    self.format_line(result.path, result.hexdigest, result.binary)
+                )
+
+    def hash_files(
+        self, files: Iterable[str], binary: bool = False
+    ) -> Iterator[HashResult]:
+        """Yield a ``HashResult`` for each of ``files``, in order.
+
+        Files are hashed by the worker pool, if one is active, a bounded number
+        at a time, so ``files`` can be arbitrarily long.
+        """
+        for fname, result, file_stats in self._imap_files(
+            functools.partial(self._hash_result, binary=binary),
+            files,
+            inline=_is_stdin,
+        ):
+            start = time.perf_counter_ns()
+            yield result
+            if file_stats is not None:
+                file_stats.error = result.error is not None
+                self._run_hooks(fname, file_stats, start)
+
+    def update_hashes(self, manifest: str, files: Iterable[str], args: Args) -> None:
+        """Rewrite ``manifest`` with the hashes of ``files``.
+
+        Digests are reused for files listed in ``manifest`` that have not been
+        modified since it was written, according to their mtime and ctime, and
+        files that are not in ``files`` are dropped. The manifest records no
+        sizes, so its modification time is set to when the run started, and a
+        file is rehashed if it was modified shortly before then, or after, as
+        it may have changed after it was hashed.
+        """
+        started = time.time_ns()
+        try:
+            since = os.stat(manifest).st_mtime_ns - RACY_NS
+            known = self._load_manifest(manifest)
+        except FileNotFoundError:
+            since, known = 0, {}
+
+        # with --recursive, the walk can come across the manifest and the
+        # temporary file that replaces it
+        skip = {os.path.abspath(manifest), os.path.abspath(_temp_path(manifest))}
+
+        def items() -> Iterator[tuple[str, bytes | None]]:
+            for fname in files:
+                if not _is_stdin(fname) and os.path.abspath(fname) in skip:
+                    continue
+                entry = known.get(fname)
+                if entry is None or entry[1] != args.binary or _is_stdin(fname):
+                    yield fname, None
+                    continue
+                try:
+                    st = os.stat(fname)
+                except OSError:
+                    yield fname, None
+                    continue
+                unchanged = max(st.st_mtime_ns, st.st_ctime_ns) < since
+                yield fname, entry[0] if unchanged else None
+
+        with _replace_file(manifest, started) as fobj:
+            for (fname, _), result, file_stats in self._imap_files(
+                functools.partial(self._reuse_or_hash, binary=args.binary),
+                items(),
+                # only files that must be read are handed to the workers
+                inline=lambda item: item[1] is not None or _is_stdin(item[0]),
+            ):
+                start = time.perf_counter_ns()
+                if result.error is not None:
+                    self._read_error(fname, result.error)
+                else:
+                    line = self.format_line(fname, result.hexdigest, result.binary)
+                    fobj.write(line + "\n")
+                if file_stats is not None:
+                    file_stats.error = result.error is not None
+                    self._run_hooks(fname, file_stats, start)
+
+    def verify(
+        self,
+        fname: str,
+        order: str = "manifest",
+        start: int = 0,
+        archives: bool = False,
+    ) -> Iterator[HashResult]:
+        """Yield a ``HashResult`` for each line of the checksum file ``fname``,
+        skipping the first ``start`` lines.
+
+        With an ``order`` other than ``manifest``, the whole file is parsed
+        and its entries are read in ``inode`` order, or by the physical offset
+        of their data with ``extent`` where the filesystem supports it, which
+        saves seeking on spinning disks. Results are still yielded, and hooks
+        called, in the order of the checksum file.
+
+        With ``archives``, paths may name ``archive!member``, and each archive
+        is read in one pass for all of its members.
+        """
+        entries: Iterable[CheckEntry] = itertools.islice(
+            self._read_check_file(fname), start, None
+        )
+        if archives:
+            results = self._verify_archives(fname, entries)
+        elif order == "manifest":
+            results = self._verify_entries(fname, entries)
+        else:
+            scheduled = self._schedule(entries, order)
+            results = resequence(
+                zip(
+                    (pos for pos, _ in scheduled),
+                    self._verify_entries(fname, (entry for _, entry in scheduled)),
+                    strict=True,
+                )
+            )
+        for result, hooked, file_stats in results:
+            start = time.perf_counter_ns()
+            yield result
+            if file_stats is not None:
+                self._run_hooks(hooked, file_stats, start)
+
+    def _schedule(
+        self, entries: Iterable[CheckEntry], order: str
+    ) -> list[tuple[int, CheckEntry]]:
+        """Number the entries, and sort them by where their files are stored."""
+        numbered = list(enumerate(entries))
+        keys = self.imap(
+            functools.partial(_read_key, order), (entry for _, entry in numbered)
+        )
+        return [
+            item
+            for _, item in sorted(
+                zip((key for _, key in keys), numbered, strict=True),
+                key=lambda pair: pair[0],
+            )
+        ]
+
+    def _verify_entries(
+        self, fname: str, entries: Iterable[CheckEntry]
+    ) -> Iterator[tuple[HashResult, str, FileStats | None]]:
+        """Yield the result for each entry, and the file and ``FileStats`` to
+        pass to the hooks once it has been written, if any."""
+        for entry, calculated, file_stats in self._imap_files(
+            self._check_entry, entries, inline=_reads_stdin
+        ):
+            result = self._check_result(fname, entry, calculated)
+            # no file was hashed for a malformed line, so don't tell the hooks
+            if file_stats is not None and result.status != FORMAT_ERROR:
+                file_stats.error = result.error is not None
+                yield result, result.path, file_stats
+            else:
+                yield result, result.path, None
+
+    def _verify_archives(
+        self, fname: str, entries: Iterable[CheckEntry]
+    ) -> Iterator[tuple[HashResult, str, FileStats | None]]:
+        """Like ``_verify_entries``, for entries that may name ``archive!member``.
+
+        Each run of lines naming members of the same archive is checked with a
+        single pass over the archive, which is once per archive for checksum
+        files written with ``--archive``. Runs and other files are handed to
+        the worker pool, and the hooks are told about each archive once.
+        """
+        for (source, run), calculated, file_stats in self._imap_files(
+            self._check_run,
+            _archive_runs(entries),
+            inline=lambda item: item[0] is None and _reads_stdin(item[1][0][0]),
+        ):
+            results = [
+                self._check_result(fname, entry, value)
+                for (entry, _), value in zip(run, calculated, strict=True)
+            ]
+            if file_stats is None or results[0].status == FORMAT_ERROR:
+                for result in results:
+                    yield result, result.path, None
+                continue
+
+            file_stats.error = any(result.error is not None for result in results)
+            hooked = results[0].path if source is None else source[0]
+            for result in results[:-1]:
+                yield result, hooked, None
+            yield results[-1], hooked, file_stats
+
+    def _check_run(self, item: ArchiveRun) -> list[str | OSError | None]:
+        """Hash the files named by a run of parsed checksum lines, reading the
+        archive they are members of, if any, once."""
+        source, run = item
+        if source is None:
+            return [self._check_entry(entry) for entry, _ in run]
+
+        digests, error = self._try_hash_archive(source)
+        found = dict(digests)
+        calculated: list[str | OSError | None] = []
+        for (_, record), name in run:
+            value = found.get(cast(str, name)) or error
+            if value is None and record is not None:
+                value = FileNotFoundError(
+                    errno.ENOENT, os.strerror(errno.ENOENT), record[2]
+                )
+            calculated.append(value)
+        return calculated
+
+    def _check_result(
+        self, fname: str, entry: CheckEntry, calculated: str | OSError | None
+    ) -> HashResult:
+        idx, record = entry
+        if record is None:
+            return HashResult(fname, FORMAT_ERROR, algorithm=self.name, line=idx + 1)
+
+        expected, binary, check_file = record
+        if calculated is None or isinstance(calculated, OSError):
+            return HashResult(
+                check_file,
+                READ_ERROR,
+                None,
+                self.name,
+                binary,
+                expected,
+                error=calculated,
+                line=idx + 1,
+            )
+        digest = bytes.fromhex(calculated)
+        return HashResult(
+            check_file,
+            SUCCESS if digest == expected else HASH_ERROR,
+            digest,
+            self.name,
+            binary,
+            expected,
+            line=idx + 1,
+        )
+
+    def _imap_files(
+        self,
+        func: Callable[[T], R],
+        iterable: Iterable[T],
+        inline: Callable[[T], bool] | None = None,
+    ) -> Iterator[tuple[T, R, FileStats | None]]:
+        """Like ``imap``, with the ``FileStats`` of each call if there are hooks."""
+        if not self.hooks:
+            for item, result in self.imap(func, iterable, inline):
+                yield item, result, None
+            return
+
+        timed = functools.partial(_timed_call, func)
+        for item, (result, file_stats) in self.imap(timed, iterable, inline):
+            yield item, result, file_stats
+
+    def _run_hooks(self, fname: str, file_stats: FileStats, output_start: int) -> None:
+        file_stats.output_ns += time.perf_counter_ns() - output_start
+        for hook in self.hooks:
+            hook(fname, file_stats)
+
+    def add_hook(self, hook: Hook) -> None:
+        """Call ``hook(fname, file_stats)`` after each file is hashed and written.
+
+        Hooks are called in the main thread, in the order the files are
+        written. While any hook is registered, the time spent opening,
+        reading, hashing and writing each file is measured.
+        """
+        self.hooks.append(hook)
+
+    def imap(
+        self,
+        func: Callable[[T], R],
+        iterable: Iterable[T],
+        inline: Callable[[T], bool] | None = None,
+    ) -> Iterator[tuple[T, R]]:
+        """Yield ``(item, func(item))`` for each item, in input order.
+
+        When a worker pool is active, up to ``4 * jobs`` items are in flight at
+        once, so ``iterable`` is consumed lazily and memory use stays bounded.
+        Items for which ``inline(item)`` is true are always run in the calling
+        thread.
+        """
+        if self.executor is None:
+            for item in iterable:
+                yield item, func(item)
+            return
+
+        window: deque[tuple[T, Future[R]]] = deque()
+        for item in iterable:
+            if inline is not None and inline(item):
+                future: Future[R] = Future()
+                try:
+                    future.set_result(func(item))
+                except Exception as e:
+                    future.set_exception(e)
+            else:
+                future = self.executor.submit(func, item)
+            window.append((item, future))
+            if len(window) >= 4 * self.jobs:
+                head, future = window.popleft()
+                yield head, future.result()
+        while window:
+            head, future = window.popleft()
+            yield head, future.result()
+
+    def _itermmap(self, mapped: mmap.mmap) -> Iterator[memoryview]:
+        with mapped, memoryview(mapped) as view:
+            for offset in range(0, len(view), self.chunk_size):
+                # release each window before the mapping is closed
+                with view[offset : offset + self.chunk_size] as window:
+                    yield window
+
+    def _map_file(self, file_object: IO) -> mmap.mmap | None:
+        """Map ``file_object`` into memory if it is a regular file that is worth
+        mapping, otherwise return ``None``."""
+        # archive members, for one, have no descriptor at all
+        fd = regular_fd(file_object)
+        if fd is None or os.fstat(fd).st_size <= self.chunk_size:
+            return None
+
+        try:
+            mapped = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        return mapped
+
+    def iterchunks(self, file_object: IO) -> Iterator[bytes | memoryview]:
+        """Yield the contents of ``file_object`` in ``chunk_size`` pieces.
+
+        Binary files are read with ``readinto`` into a single buffer, or mapped
+        into memory when ``use_mmap`` is set, so each yielded memoryview is only
+        valid until the next chunk is requested. Anything else is read with
+        ``read``, with text encoded as UTF-8.
+
+        Regular files are read with sequential access advice, which also
+        enlarges the readahead window. Unless ``page_cache`` is ``keep``, their
+        pages are dropped from the page cache once hashed, and with ``bypass``
+        binary files are read with ``O_DIRECT`` where the filesystem allows.
+        """
+        fd = regular_fd(file_object)
+        if fd is None:
+            yield from self._read_chunks(file_object)
+            return
+
+        advise(fd, "SEQUENTIAL")
+        if self.page_cache == "keep":
+            yield from self._read_chunks(file_object)
+            return
+
+        offset = os.lseek(fd, 0, os.SEEK_CUR)
+        chunks: Iterator[bytes | memoryview]
+        if self.page_cache == "bypass" and isinstance(
+            file_object, (io.BufferedIOBase, io.RawIOBase)
+        ):
+            chunks = direct_chunks(fd, self.chunk_size, offset)
+        else:
+            chunks = self._read_chunks(file_object)
+        yield from dropping(chunks, fd, offset)
+
+    def _read_chunks(self, file_object: IO) -> Iterator[bytes | memoryview]:
+        if isinstance(file_object, (io.BufferedIOBase, io.RawIOBase)):
+            if self.use_mmap and (mapped := self._map_file(file_object)) is not None:
+                yield from self._itermmap(mapped)
+                return
+
+            buf = bytearray(self.chunk_size)
+            view = memoryview(buf)
+            while size := file_object.readinto(buf):
+                yield view[:size]
+            return
 
-    def iterchunks(self, file_object: IO) -> Iterator[bytes]:
         data = file_object.read(self.chunk_size)
         if isinstance(data, str):
             while data != "":
@@ -178,7 +1085,9 @@ class Hasher:
                 yield cast(bytes, data)
                 data = file_object.read(self.chunk_size)
 
-    def take_action(self, parsed_args: Args) -> None:
+    def take_action(self, parsed_args: Args) -> int:
+        """Generate, update or check hashes, returning 1 if a file that was
+        to be hashed couldn't be read, and 0 otherwise."""
         if parsed_args.check and (parsed_args.binary and parsed_args.text):
             raise RuntimeError(
                 "the --binary and --text options are meaningless when "
@@ -196,29 +1105,485 @@ class Hasher:
                 "only when verifying checksums"
             )
 
-        if not parsed_args.files:
+        if not parsed_args.check and parsed_args.checkpoint is not None:
+            raise RuntimeError(
+                "the --checkpoint option is meaningful only when verifying checksums"
+            )
+
+        if parsed_args.archive and (
+            parsed_args.update is not None or parsed_args.read_order != "manifest"
+        ):
+            raise RuntimeError(
+                "the --archive option can't be used with --update or --read-order"
+            )
+
+        if parsed_args.resume and parsed_args.checkpoint is None:
+            raise RuntimeError("the --resume option requires --checkpoint")
+
+        if not parsed_args.check and parsed_args.read_order != "manifest":
+            raise RuntimeError(
+                "the --read-order option is meaningful only when verifying checksums"
+            )
+
+        if parsed_args.jobs < 1:
+            raise RuntimeError("the --jobs option must be a positive integer")
+
+        if parsed_args.chunk_size < 1:
+            raise RuntimeError("the --chunk-size option must be a positive integer")
+
+        if parsed_args.mmap and parsed_args.page_cache == "bypass":
+            raise RuntimeError(
+                "the --mmap option can't be used with --page-cache bypass"
+            )
+
+        if parsed_args.cache is not None and parsed_args.xattr_cache:
+            raise RuntimeError(
+                "the --cache and --xattr-cache options are mutually exclusive"
+            )
+
+        if parsed_args.check and parsed_args.recursive:
+            raise RuntimeError(
+                "the --recursive option is meaningless when verifying checksums"
+            )
+
+        if parsed_args.check and parsed_args.update is not None:
+            raise RuntimeError(
+                "the --update option is meaningless when verifying checksums"
+            )
+
+        if parsed_args.files_from == "-" and "-" in parsed_args.files:
+            raise RuntimeError(
+                "stdin can't be both hashed and read by --files-from at once"
+            )
+
+        if not (parsed_args.files or parsed_args.files_from):
             parsed_args.files = ["-"]
 
-        for fname in parsed_args.files:
+        self.read_failed = False
+        with contextlib.ExitStack() as stack:
+            files: Iterable[str] = parsed_args.files
+            if parsed_args.files_from == "-":
+                files = itertools.chain(
+                    files, read_paths(sys.stdin.buffer, parsed_args.null)
+                )
+            elif parsed_args.files_from is not None:
+                files_from = stack.enter_context(open(parsed_args.files_from, "rb"))
+                files = itertools.chain(files, read_paths(files_from, parsed_args.null))
+            if parsed_args.recursive:
+                files = walk(
+                    files,
+                    include=parsed_args.include,
+                    exclude=parsed_args.exclude,
+                    sort=parsed_args.sort,
+                    onerror=self._walk_error,
+                )
+
+            self.chunk_size = parsed_args.chunk_size
+            self.use_mmap = parsed_args.mmap
+            self.page_cache = parsed_args.page_cache
+            # worker processes can't share a bucket, so each gets a share
+            shares = parsed_args.jobs if parsed_args.executor == "process" else 1
+            if parsed_args.max_rate is not None:
+                self.max_rate = TokenBucket(parsed_args.max_rate, shares=shares)
+                stack.callback(setattr, self, "max_rate", None)
+            if parsed_args.max_files_per_sec is not None:
+                self.max_files = TokenBucket(
+                    parsed_args.max_files_per_sec, shares=shares
+                )
+                stack.callback(setattr, self, "max_files", None)
+            self.jobs = parsed_args.jobs
+            stack.callback(self._close)
+            if parsed_args.stats:
+                stats = Stats(self.name)
+                self.add_hook(stats)
+                stack.callback(self._write_stats, stats, parsed_args)
+                stack.callback(self.hooks.remove, stats)
+            if parsed_args.progress:
+                self._start_progress(stack, parsed_args)
+            if parsed_args.xattr_cache and not parsed_args.no_cache:
+                self.cache = XattrCache(refresh=parsed_args.refresh_cache)
+            elif parsed_args.cache is not None and not parsed_args.no_cache:
+                self.cache = DigestCache(
+                    parsed_args.cache,
+                    refresh=parsed_args.refresh_cache,
+                    max_age=parsed_args.cache_max_age,
+                    max_entries=parsed_args.cache_max_entries,
+                )
+            if self.jobs > 1 and parsed_args.executor == "process":
+                self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+            elif self.jobs > 1:
+                self.executor = ThreadPoolExecutor(max_workers=self.jobs)
+
             if parsed_args.check:
-                self.check_hash(fname, parsed_args)
+                if parsed_args.checkpoint is not None:
+                    self.checkpoint = Checkpoint(
+                        parsed_args.checkpoint, self.name, resume=parsed_args.resume
+                    )
+                    stack.callback(setattr, self, "checkpoint", None)
+                for fname in files:
+                    self.check_hash(fname, parsed_args)
+                if self.checkpoint is not None:
+                    self.checkpoint.remove()
+            elif parsed_args.update is not None:
+                self.update_hashes(parsed_args.update, files, parsed_args)
+            elif parsed_args.archive:
+                self.generate_archives(files, parsed_args)
             else:
-                self.generate_hash(fname, parsed_args)
+                self.generate_hashes(files, parsed_args)
+        return int(self.read_failed)
 
 
 class MD5Hasher(Hasher):
-    CHECK_RE = re.compile(r"^([a-f0-9]{32}) (\*| )(.+)$")
     name = "md5"
     hashlib = hashlib.md5
 
 
 class SHA1Hasher(Hasher):
-    CHECK_RE = re.compile(r"^([a-f0-9]{40}) (\*| )(.+)$")
     name = "sha1"
     hashlib = hashlib.sha1
 
 
 class SHA256Hasher(Hasher):
-    CHECK_RE = re.compile(r"^([a-f0-9]{64}) (\*| )(.+)$")
     name = "sha256"
     hashlib = hashlib.sha256
+
+
+class MultiHasher(Hasher):
+    """Calculate several kinds of hashes with a single pass over each file.
+
+    Each hash is written to its own writer in ``outputs`` as a regular
+    checksum line, or, if ``outputs`` is empty, to ``stdout`` as one tagged
+    ``NAME (file) = digest`` line per hash.
+    """
+
+    name = "multi"
+
+    def __init__(
+        self,
+        stdout: Writer,
+        stderr: Writer,
+        hashers: Sequence[type[Hasher]],
+        outputs: Mapping[str, Writer] | None = None,
+    ) -> None:
+        super().__init__(stdout, stderr)
+        self.hashers = list(hashers)
+        self.outputs = dict(outputs or {})
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = super().__getstate__()
+        state["outputs"] = {}
+        return state
+
+    def _calculate_hashes(self, file_object: IO) -> list[str]:
+        """Calculate every hash value for the data in ``file_object``."""
+        hashers = [klass.hashlib() for klass in self.hashers]
+        for chunk in self._chunks(file_object):
+            for hasher in hashers:
+                hasher.update(chunk)
+        return [hasher.hexdigest() for hasher in hashers]
+
+    def _hash_path_multi(self, fname: str, binary: bool = False) -> list[str]:
+        fobj = self._open_timed(fname, binary)
+        try:
+            if self.cache is None or _is_stdin(fname):
+                return self._calculate_hashes(fobj)
+
+            st = os.fstat(fobj.fileno())
+            kinds = [klass._cache_kind(binary) for klass in self.hashers]
+            cached = [self.cache.get(fname, kind, st) for kind in kinds]
+            if None not in cached:
+                return cast(list[str], cached)
+            hash_values = self._calculate_hashes(fobj)
+            if same_file(st, os.fstat(fobj.fileno())):
+                for kind, hash_value in zip(kinds, hash_values, strict=True):
+                    self.cache.put(fname, kind, st, hash_value)
+            return hash_values
+        finally:
+            if not _is_stdin(fname):
+                fobj.close()
+
+    def _try_hash_path_multi(
+        self, fname: str, binary: bool = False
+    ) -> list[str] | OSError:
+        try:
+            return self._hash_path_multi(fname, binary)
+        except OSError as e:
+            return e
+
+    def generate_hash(self, fname: str, args: Args) -> None:
+        self.generate_hashes([fname], args)
+
+    def generate_hashes(self, files: Iterable[str], args: Args) -> None:
+        for result in self.hash_files(files, args.binary):
+            if result.error is not None:
+                self._read_error(result.path, result.error)
+            elif result.algorithm in self.outputs:
+                line = self.format_line(result.path, result.hexdigest, result.binary)
+                self.outputs[result.algorithm](line)
+            else:
+                self.stdout(
+                    f"{result.algorithm.upper()} ({result.path}) = {result.hexdigest}"
+                )
+
+    def hash_files(
+        self, files: Iterable[str], binary: bool = False
+    ) -> Iterator[HashResult]:
+        """Yield a ``HashResult`` for each hash of each file.
+
+        A file that can't be read gets a single result, for ``multi``.
+        """
+        for fname, hash_values, file_stats in self._imap_files(
+            functools.partial(self._try_hash_path_multi, binary=binary),
+            files,
+            inline=_is_stdin,
+        ):
+            start = time.perf_counter_ns()
+            if isinstance(hash_values, OSError):
+                yield HashResult(
+                    fname, READ_ERROR, None, self.name, binary, error=hash_values
+                )
+            else:
+                for klass, hash_value in zip(self.hashers, hash_values, strict=True):
+                    yield HashResult(
+                        fname, SUCCESS, bytes.fromhex(hash_value), klass.name, binary
+                    )
+            if file_stats is not None:
+                file_stats.error = isinstance(hash_values, OSError)
+                self._run_hooks(fname, file_stats, start)
+
+    def take_action(self, parsed_args: Args) -> int:
+        if parsed_args.check:
+            raise RuntimeError(
+                "the multi command cannot verify checksums; "
+                "use the command for each hash instead"
+            )
+        return super().take_action(parsed_args)
+
+
+class TreeHasher(Hasher):
+    """Base class for hashing large files as a Merkle tree of fixed-size leaves.
+
+    The file is split into ``leaf_size`` leaves, the last of which may be
+    short; an empty file is a single empty leaf. Each leaf is hashed as
+    ``H(0x00 || leaf)``, and pairs of nodes as ``H(0x01 || left || right)``,
+    forming the left-balanced tree of RFC 6962: when a level has an odd node
+    left over, it is paired at the first level where a node of its height
+    is available. The digest is the hex encoded root.
+
+    Leaves of regular files are read with ``os.pread`` and hashed by up to
+    ``jobs`` threads at once. Anything else is read sequentially.
+
+    Lines are written, and checked, as ``TAG (path) = digest``.
+    """
+
+    leaf_size: ClassVar[int] = 1024 * 1024
+    tag: ClassVar[str]
+    streaming = False
+
+    def __init__(self, stdout: Writer, stderr: Writer) -> None:
+        super().__init__(stdout, stderr)
+        self.leaf_executor: Executor | None = None
+        self.leaf_jobs = 1
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = super().__getstate__()
+        state["leaf_executor"] = None
+        return state
+
+    def _calculate_hash(self, file_object: IO) -> str:
+        file_stats = _file_stats.get()
+        if file_stats is None:
+            return self._calculate_tree(file_object)
+        # leaves are read and hashed together, possibly by other threads
+        start = time.perf_counter_ns()
+        try:
+            return self._calculate_tree(file_object)
+        finally:
+            file_stats.hash_ns += time.perf_counter_ns() - start
+
+    def _calculate_tree(self, file_object: IO) -> str:
+        leaves = self._leaf_digests(file_object)
+        file_stats = _file_stats.get()
+        if self.progress is not None and file_stats is not None:
+            leaves = self._reported(leaves, file_stats, self.progress)
+
+        # nodes whose height is strictly decreasing from the bottom of the stack
+        stack: list[tuple[int, bytes]] = []
+        for leaf in leaves:
+            height = 0
+            while stack and stack[-1][0] == height:
+                leaf = self._node(stack.pop()[1], leaf)
+                height += 1
+            stack.append((height, leaf))
+
+        _, root = stack.pop()
+        while stack:
+            root = self._node(stack.pop()[1], root)
+        return root.hex()
+
+    def _hash_leaf(self, data: bytes) -> bytes:
+        hasher = self.hashlib()
+        hasher.update(b"\x00")
+        hasher.update(data)
+        return hasher.digest()
+
+    def _leaf_digests(self, file_object: IO) -> Iterator[bytes]:
+        fd = regular_fd(file_object)
+        file_stats = _file_stats.get()
+        if fd is None:
+            data = file_object.read(self.leaf_size)
+            while True:
+                if file_stats is not None:
+                    file_stats.bytes += len(data)
+                yield self._hash_leaf(data)
+                if not (data := file_object.read(self.leaf_size)):
+                    return
+
+        size = os.fstat(fd).st_size
+        if file_stats is not None:
+            file_stats.bytes += size
+        advise(fd, "SEQUENTIAL")
+        count = max(1, -(-size // self.leaf_size))
+        read_leaf = functools.partial(self._read_leaf, fd)
+        if self.leaf_executor is None:
+            yield from map(read_leaf, range(count))
+            return
+
+        window: deque[Future[bytes]] = deque()
+        for index in range(count):
+            window.append(self.leaf_executor.submit(read_leaf, index))
+            if len(window) >= 4 * self.leaf_jobs:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+    def _node(self, left: bytes, right: bytes) -> bytes:
+        hasher = self.hashlib()
+        hasher.update(b"\x01")
+        hasher.update(left)
+        hasher.update(right)
+        return hasher.digest()
+
+    def _open_file(self, fname: str, binary: bool = False) -> IO:
+        # the tree is always built from the bytes of the file
+        if fname == "-":
+            return getattr(sys.stdin, "buffer", sys.stdin)
+        return open(fname, "rb")
+
+    def _parse_check_file(self, file_object: IO) -> Iterator[CheckEntry]:
+        for idx, line in enumerate(file_object):
+            if isinstance(line, bytes):
+                line = os.fsdecode(line)
+            m = self.CHECK_RE.match(line.strip())
+            if m is None:
+                yield idx, None
+            else:
+                check_file, hash_value = m.groups()
+                yield idx, (bytes.fromhex(hash_value), True, check_file)
+
+    def _reported(
+        self, leaves: Iterator[bytes], file_stats: FileStats, progress: Progress
+    ) -> Iterator[bytes]:
+        for leaf in leaves:
+            nbytes = min(self.leaf_size, file_stats.bytes - file_stats.reported)
+            progress.add(nbytes)
+            file_stats.reported += nbytes
+            yield leaf
+
+    def _read_leaf(self, fd: int, index: int) -> bytes:
+        offset = index * self.leaf_size
+        data = os.pread(fd, self.leaf_size, offset)
+        # short reads are allowed, e.g. on network filesystems
+        while len(data) < self.leaf_size:
+            more = os.pread(fd, self.leaf_size - len(data), offset + len(data))
+            if not more:
+                break
+            data += more
+        if self.max_rate is not None:
+            self.max_rate.take(len(data))
+        if self.page_cache != "keep":
+            # leaves are read with pread, which O_DIRECT would need aligned
+            advise(fd, "DONTNEED", offset, len(data))
+        return self._hash_leaf(data)
+
+    def format_line(self, fname: str, hash_value: str, binary: bool) -> str:
+        return f"{self.tag} ({fname}) = {hash_value}"
+
+    def take_action(self, parsed_args: Args) -> int:
+        if not parsed_args.check:
+            # the tree is built from the bytes of the file, as it is when
+            # checking, so --update and the caches must agree on the mode
+            parsed_args = dataclasses.replace(parsed_args, binary=True, text=False)
+        # files are hashed one at a time, with the workers hashing their leaves
+        self.leaf_jobs = parsed_args.jobs
+        with contextlib.ExitStack() as stack:
+            if parsed_args.jobs > 1:
+                self.leaf_executor = stack.enter_context(
+                    ThreadPoolExecutor(max_workers=parsed_args.jobs)
+                )
+                stack.callback(setattr, self, "leaf_executor", None)
+            return super().take_action(dataclasses.replace(parsed_args, jobs=1))
+
+
+class SHA256TreeHasher(TreeHasher):
+    CHECK_RE = re.compile(r"^SHA256-TREE \((.+)\) = ([a-f0-9]{64})$")
+    name = "sha256-tree"
+    summary = "Generate or check sha256 tree hashes of large files"
+    tag = "SHA256-TREE"
+    hashlib = hashlib.sha256
+
+
+HASHERS: dict[str, type[Hasher]] = {}
+
+H = TypeVar("H", bound=type[Hasher])
+
+
+def register(klass: H) -> H:
+    """Make ``klass`` available as a command, and to multi if it is streaming."""
+    HASHERS[klass.name] = klass
+    return klass
+
+
+def hasher_class(name: str, constructor: Callable[..., Hash]) -> type[Hasher]:
+    """Create and register a ``Hasher`` for a hashlib style ``constructor``."""
+    klass = type(
+        f"{name.upper().replace('-', '_')}Hasher",
+        (Hasher,),
+        {"__module__": __name__, "name": name, "hashlib": staticmethod(constructor)},
+    )
+    # worker processes look the class up by name when unpickling
+    globals().setdefault(klass.__name__, klass)
+    return register(klass)
+
+
+def load_plugins(group: str = "hasher.hashers") -> None:
+    """Register the ``Hasher`` sub-classes advertised by installed packages."""
+    for entry_point in importlib.metadata.entry_points(group=group):
+        try:
+            klass = entry_point.load()
+        except Exception:
+            log.warning("unable to load hasher plugin '%s'", entry_point.name)
+            log.debug("plugin traceback", exc_info=True)
+            continue
+        if not (isinstance(klass, type) and issubclass(klass, Hasher)):
+            log.warning("hasher plugin '%s' is not a Hasher", entry_point.name)
+            continue
+        register(klass)
+
+
+for _klass in (MD5Hasher, SHA1Hasher, SHA256Hasher, SHA256TreeHasher):
+    register(_klass)
+
+for _algorithm in sorted(hashlib.algorithms_guaranteed):
+    # shake digests have no fixed length
+    if not _algorithm.startswith("shake_"):
+        _name = _algorithm.replace("_", "-")
+        if _name not in HASHERS:
+            hasher_class(_name, getattr(hashlib, _algorithm))
+
+try:
+    _blake3 = importlib.import_module("blake3")
+except ImportError:
+    pass
+else:
+    hasher_class("blake3", _blake3.blake3)
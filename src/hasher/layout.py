@@ -0,0 +1,99 @@
+# Copyright 2013 Walter Scheper
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Order reads by where files are stored, to reduce seeking."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from typing import TypeVar
+import logging
+import os
+import struct
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None  # type: ignore[assignment]
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+READ_ORDERS = ("manifest", "inode", "extent")
+
+# _IOWR('f', 11, struct fiemap) from linux/fs.h
+FS_IOC_FIEMAP = 0xC020660B
+FIEMAP_FLAG_SYNC = 0x1
+# struct fiemap, followed by a single struct fiemap_extent
+_FIEMAP = struct.Struct("=QQIIII")
+_EXTENT = struct.Struct("=QQQQQIIII")
+
+# sorts before every file, for entries that won't be read
+FIRST = (-1, -1, -1, -1)
+
+
+def physical_offset(fd: int) -> int | None:
+    """Return where the first extent of the open file ``fd`` is on its device,
+    or ``None`` if the filesystem can't tell, or the file is empty."""
+    if fcntl is None:
+        return None
+    request = _FIEMAP.pack(0, 2**64 - 1, FIEMAP_FLAG_SYNC, 0, 1, 0)
+    buf = bytearray(request + bytes(_EXTENT.size))
+    try:
+        fcntl.ioctl(fd, FS_IOC_FIEMAP, buf, True)
+    except OSError as e:
+        log.debug("unable to map the extents of file %d: %s", fd, e)
+        return None
+    mapped = _FIEMAP.unpack_from(buf)[3]
+    if not mapped:
+        return None
+    return _EXTENT.unpack_from(buf, _FIEMAP.size)[1]
+
+
+def read_key(order: str, path: str) -> tuple[int, int, int, int]:
+    """The position of the file at ``path`` in a read schedule.
+
+    Files are ordered by device, then by their inode number, which on most
+    filesystems roughly follows where they were allocated. With ``extent``,
+    they are ordered by the physical offset of their data instead, and files
+    without one, such as empty files, follow by inode number.
+    """
+    try:
+        if order != "extent":
+            st = os.stat(path)
+            return (st.st_dev, 0, st.st_ino, st.st_ino)
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return FIRST
+    try:
+        st = os.fstat(fd)
+        offset = physical_offset(fd)
+    finally:
+        os.close(fd)
+    if offset is None:
+        return (st.st_dev, 1, st.st_ino, st.st_ino)
+    return (st.st_dev, 0, offset, st.st_ino)
+
+
+def resequence(items: Iterable[tuple[int, T]]) -> Iterator[T]:
+    """Yield the values of ``(position, value)`` pairs by position, where the
+    positions are ``0, 1, 2...`` in any order."""
+    pending: dict[int, T] = {}
+    position = 0
+    for index, value in items:
+        pending[index] = value
+        while position in pending:
+            yield pending.pop(position)
+            position += 1
@@ -0,0 +1,126 @@
+# Copyright 2013 Walter Scheper
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import IO, Any
+import contextlib
+import signal
+import sys
+import threading
+
+from hasher.hashes import Writer
+
+BUFFER_SIZE = 64 * 1024
+FLUSH_INTERVAL = 1.0
+
+
+class BufferedWriter:
+    """A ``Writer`` that collects lines and writes them to ``stream`` in batches.
+
+    Lines are written once ``size`` characters are buffered, or at most
+    ``interval`` seconds after the first buffered line, whichever comes first.
+    Messages for another file, or for stderr, flush the buffer first so that
+    the order of everything written stays the same.
+    """
+
+    def __init__(
+        self,
+        stream: IO[str],
+        size: int = BUFFER_SIZE,
+        interval: float = FLUSH_INTERVAL,
+    ) -> None:
+        self.stream = stream
+        self.size = size
+        self.interval = interval
+        self._lines: list[str] = []
+        self._buffered = 0
+        self._lock = threading.RLock()
+        self._timer: threading.Timer | None = None
+
+    def __call__(
+        self,
+        message: Any | None = None,
+        file: IO[Any] | None = None,
+        nl: bool = True,
+        err: bool = False,
+        color: bool | None = None,
+    ) -> None:
+        text = "" if message is None else str(message)
+        if nl:
+            text += "\n"
+
+        if err or (file is not None and file is not self.stream):
+            self.flush()
+            stream = sys.stderr if file is None else file
+            stream.write(text)
+            stream.flush()
+            return
+
+        with self._lock:
+            self._lines.append(text)
+            self._buffered += len(text)
+            if self._buffered >= self.size:
+                self.flush()
+            elif self._timer is None and self.interval > 0:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def __enter__(self) -> BufferedWriter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._lines:
+                self.stream.write("".join(self._lines))
+                self._lines.clear()
+                self._buffered = 0
+            self.stream.flush()
+
+    def flushing(self, writer: Writer) -> Writer:
+        """Wrap ``writer`` so that this buffer is flushed before it writes."""
+
+        def write(*args: Any, **kwargs: Any) -> None:
+            self.flush()
+            writer(*args, **kwargs)
+
+        return write
+
+
+@contextlib.contextmanager
+def exit_on_sigterm() -> Iterator[None]:
+    """Turn SIGTERM into ``SystemExit`` so buffered output is flushed on exit."""
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def terminate(signum: int, frame: object) -> None:
+        sys.exit(128 + signum)
+
+    previous = signal.signal(signal.SIGTERM, terminate)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, previous)
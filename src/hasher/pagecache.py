@@ -0,0 +1,134 @@
+# Copyright 2013 Walter Scheper
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Control how reading files affects the page cache."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from typing import IO
+import errno
+import logging
+import mmap
+import os
+import stat
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None  # type: ignore[assignment]
+
+log = logging.getLogger(__name__)
+
+# keep: leave pages cached, as usual
+# drop: drop pages from the cache once they have been hashed
+# bypass: read with O_DIRECT where supported, otherwise drop
+PAGE_CACHE_MODES = ("keep", "drop", "bypass")
+
+# consumed bytes to drop from the cache at once
+DROP_BYTES = 8 * 1024 * 1024
+# O_DIRECT reads must be aligned to the logical block size of the device,
+# which is at most the page size in practice
+DIRECT_ALIGN = mmap.PAGESIZE
+O_DIRECT: int = getattr(os, "O_DIRECT", 0)
+
+
+def advise(fd: int, advice: str, offset: int = 0, length: int = 0) -> None:
+    """Give ``POSIX_FADV_<advice>`` for a range of ``fd``, by default the whole
+    file, where the platform supports it."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, getattr(os, f"POSIX_FADV_{advice}"))
+    except OSError as e:
+        log.debug("unable to advise %s for file %d: %s", advice, fd, e)
+
+
+def regular_fd(file_object: IO) -> int | None:
+    """Return the descriptor of ``file_object`` if it is a regular file."""
+    try:
+        fd = file_object.fileno()
+        if stat.S_ISREG(os.fstat(fd).st_mode):
+            return fd
+    except (OSError, ValueError, AttributeError):
+        pass
+    return None
+
+
+def dropping(
+    chunks: Iterable[bytes | memoryview], fd: int, offset: int = 0
+) -> Iterator[bytes | memoryview]:
+    """Yield ``chunks``, read from ``fd`` starting at ``offset``, dropping them
+    from the page cache in steps of ``DROP_BYTES`` once they are consumed, and
+    the whole file when done."""
+    dropped = consumed = offset
+    try:
+        for chunk in chunks:
+            yield chunk
+            consumed += len(chunk)
+            if consumed - dropped >= DROP_BYTES:
+                advise(fd, "DONTNEED", dropped, consumed - dropped)
+                dropped = consumed
+    finally:
+        # including whatever was read ahead
+        advise(fd, "DONTNEED")
+
+
+def _set_direct(fd: int, direct: bool) -> bool:
+    """Turn ``O_DIRECT`` on or off for ``fd``, returning whether it is on."""
+    if fcntl is None or not O_DIRECT:
+        return False
+    try:
+        flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+        fcntl.fcntl(
+            fd, fcntl.F_SETFL, flags | O_DIRECT if direct else flags & ~O_DIRECT
+        )
+    except OSError as e:
+        log.debug("unable to set O_DIRECT for file %d: %s", fd, e)
+        return False
+    return direct
+
+
+def direct_chunks(fd: int, chunk_size: int, offset: int = 0) -> Iterator[memoryview]:
+    """Yield the contents of ``fd`` from ``offset`` in pieces of ``chunk_size``
+    rounded up to whole pages, read with ``O_DIRECT`` into a page aligned
+    buffer.
+
+    Where the filesystem refuses direct reads, including the unaligned read
+    that follows a short read at the end of the file, reading carries on
+    through the page cache. Each memoryview is only valid until the next
+    chunk is requested.
+    """
+    size = -(-chunk_size // DIRECT_ALIGN) * DIRECT_ALIGN
+    direct = _set_direct(fd, True)
+    try:
+        # anonymous mappings are page aligned
+        with mmap.mmap(-1, size) as buf, memoryview(buf) as view:
+            while True:
+                try:
+                    nbytes = os.preadv(fd, [buf], offset)
+                except OSError as e:
+                    if not direct or e.errno != errno.EINVAL:
+                        raise
+                    direct = _set_direct(fd, False)
+                    continue
+                if not nbytes:
+                    return
+                # release each window before the buffer is closed
+                with view[:nbytes] as window:
+                    yield window
+                offset += nbytes
+    finally:
+        if direct:
+            _set_direct(fd, False)
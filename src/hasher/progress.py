@@ -0,0 +1,139 @@
+# Copyright 2013 Walter Scheper
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+import logging
+import threading
+import time
+
+from hasher.stats import FileStats
+
+log = logging.getLogger(__name__)
+
+# bytes to hash before reporting them from the read loop
+REPORT_BYTES = 1024 * 1024
+INTERVAL = 0.5
+# weight of the latest interval in the smoothed rate
+SMOOTHING = 0.3
+
+
+def _duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class Progress:
+    """A ``Hasher`` hook that writes a progress line at most every ``interval``.
+
+    Bytes are reported by the read loop with ``add``, in steps of at least
+    ``REPORT_BYTES``, and whatever was not reported that way, e.g. by worker
+    processes, once the file is done. The total amount of work is filled in by
+    ``size`` when it is known, which enables the ETA.
+
+    With ``rewrite``, the line is redrawn in place, as on a terminal,
+    otherwise a new line is written each time.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[str], None],
+        rewrite: bool = False,
+        interval: float = INTERVAL,
+    ) -> None:
+        self.write = write
+        self.rewrite = rewrite
+        self.interval = interval
+        self.bytes = 0
+        self.files = 0
+        self.total_bytes: int | None = None
+        self.total_files: int | None = None
+        self.rate = 0.0
+        self.started = self._last_time = time.monotonic()
+        self._last_bytes = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, fname: str, file_stats: FileStats) -> None:
+        with self._lock:
+            self.files += 1
+            self.bytes += file_stats.bytes - file_stats.reported
+            self._tick()
+
+    def add(self, nbytes: int) -> None:
+        with self._lock:
+            self.bytes += nbytes
+            self._tick()
+
+    def size(self, sizes: Iterable[int]) -> threading.Thread:
+        """Add up ``sizes`` in a background thread to set the totals."""
+
+        def count() -> None:
+            total_files = total_bytes = 0
+            try:
+                for size in sizes:
+                    total_files += 1
+                    total_bytes += size
+            except Exception:
+                log.debug("unable to size the work to do", exc_info=True)
+                return
+            with self._lock:
+                self.total_files, self.total_bytes = total_files, total_bytes
+
+        thread = threading.Thread(target=count, name="progress-size", daemon=True)
+        thread.start()
+        return thread
+
+    def _tick(self) -> None:
+        now = time.monotonic()
+        if now - self._last_time >= self.interval:
+            self._draw(now)
+
+    def _draw(self, now: float) -> None:
+        elapsed = now - self._last_time
+        # a final update right after the last one says little about the rate
+        if elapsed >= self.interval / 2:
+            rate = (self.bytes - self._last_bytes) / elapsed
+            if self.rate:
+                rate = SMOOTHING * rate + (1 - SMOOTHING) * self.rate
+            self.rate = rate
+            self._last_time, self._last_bytes = now, self.bytes
+        self.write(self.line(now))
+
+    def line(self, now: float | None = None) -> str:
+        now = time.monotonic() if now is None else now
+        files = f"{self.files}"
+        if self.total_files is not None:
+            files += f"/{self.total_files}"
+        line = (
+            f"{self.bytes / 1e6:.1f} MB, {files} files, {self.rate / 1e6:.1f} MB/s, "
+            f"{_duration(now - self.started)} elapsed"
+        )
+        if self.total_bytes is not None and self.rate > 0:
+            remaining = max(self.total_bytes - self.bytes, 0) / self.rate
+            line += f", ETA {_duration(remaining)}"
+        if self.rewrite:
+            return f"\r{line}\x1b[K"
+        return line
+
+    def close(self) -> None:
+        """Write the final progress line, with the average rate."""
+        with self._lock:
+            now = time.monotonic()
+            # the final line shows the average rate
+            self.rate = self.bytes / max(now - self.started, 1e-9)
+            self.write(self.line(now))
+            if self.rewrite:
+                self.write("\n")
@@ -0,0 +1,116 @@
+# Copyright 2013 Walter Scheper
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+import heapq
+import itertools
+import json
+import time
+
+STEPS = ("open", "read", "hash", "output")
+
+
+@dataclass(slots=True)
+class FileStats:
+    """Where the time went while hashing one file, in nanoseconds."""
+
+    open_ns: int = 0
+    read_ns: int = 0
+    hash_ns: int = 0
+    output_ns: int = 0
+    bytes: int = 0
+    # bytes already passed to a progress report while reading
+    reported: int = 0
+    error: bool = False
+
+    @property
+    def total_ns(self) -> int:
+        return self.open_ns + self.read_ns + self.hash_ns + self.output_ns
+
+
+class Stats:
+    """A ``Hasher`` hook that adds up the ``FileStats`` of every file.
+
+    Step times are summed over all files, so with several jobs they can add
+    up to more than the elapsed time. The ``slowest`` files are kept by name.
+    """
+
+    def __init__(self, name: str, slowest: int = 10) -> None:
+        self.name = name
+        self.slowest = slowest
+        self.started = time.perf_counter()
+        self.totals = FileStats()
+        self.files = 0
+        self.errors = 0
+        self._slowest: list[tuple[int, int, str, int]] = []
+        self._counter = itertools.count()
+
+    def __call__(self, fname: str, file_stats: FileStats) -> None:
+        totals = self.totals
+        totals.open_ns += file_stats.open_ns
+        totals.read_ns += file_stats.read_ns
+        totals.hash_ns += file_stats.hash_ns
+        totals.output_ns += file_stats.output_ns
+        totals.bytes += file_stats.bytes
+        self.files += 1
+        self.errors += file_stats.error
+
+        item = (file_stats.total_ns, next(self._counter), fname, file_stats.bytes)
+        if len(self._slowest) < self.slowest:
+            heapq.heappush(self._slowest, item)
+        elif self._slowest and item > self._slowest[0]:
+            heapq.heapreplace(self._slowest, item)
+
+    def summary(self) -> dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "hasher": self.name,
+            "files": self.files,
+            "errors": self.errors,
+            "bytes": self.totals.bytes,
+            "elapsed": round(elapsed, 6),
+            "mb_per_s": round(self.totals.bytes / max(elapsed, 1e-9) / 1e6, 2),
+            "files_per_s": round(self.files / max(elapsed, 1e-9), 2),
+            "seconds": {
+                step: getattr(self.totals, f"{step}_ns") / 1e9 for step in STEPS
+            },
+            "slowest": [
+                {"path": fname, "seconds": total_ns / 1e9, "bytes": size}
+                for total_ns, _, fname, size in sorted(self._slowest, reverse=True)
+            ],
+        }
+
+    def format(self, kind: str = "text") -> str:
+        """Format the summary as ``json`` or as lines of ``text``."""
+        summary = self.summary()
+        if kind == "json":
+            return json.dumps(summary)
+
+        lines = [
+            f"hasher {self.name}: {summary['files']} files ({summary['errors']} "
+            f"failed), {summary['bytes']} bytes in {summary['elapsed']:.3f}s, "
+            f"{summary['mb_per_s']:.2f} MB/s, {summary['files_per_s']:.2f} files/s"
+        ]
+        lines.extend(
+            f"hasher {self.name}: {step:<6} {seconds:10.3f}s"
+            for step, seconds in summary["seconds"].items()
+        )
+        lines.extend(
+            f"hasher {self.name}: slowest {item['seconds']:10.3f}s {item['path']}"
+            for item in summary["slowest"]
+        )
+        return "\n".join(lines)
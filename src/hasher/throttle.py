@@ -0,0 +1,90 @@
+# Copyright 2013 Walter Scheper
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Limit how fast files are read."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+import functools
+import threading
+import time
+import uuid
+
+# the burst allowed after a pause, in seconds at the full rate
+BURST = 0.1
+
+
+class TokenBucket:
+    """Limit the rate of a quantity, such as bytes read, to ``rate`` per second.
+
+    ``take`` may run the bucket into debt, so amounts larger than the burst
+    size, such as a whole chunk, are allowed, and the caller waits until the
+    debt is paid off. Threads share a bucket safely: each waits for its own
+    share of the debt, so together they stay at ``rate``.
+
+    A bucket sent to a worker process becomes a single bucket for that
+    process, shared by every task it runs, with a ``1/shares`` part of the
+    rate. Buckets with the same rate are still kept apart.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float | None = None,
+        shares: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if rate <= 0:
+            raise RuntimeError("the rate must be positive")
+        self.rate = rate
+        self.burst = max(rate * BURST, 1) if burst is None else burst
+        self.shares = shares
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.burst
+        self._last = clock()
+        self._lock = threading.Lock()
+        # identifies the bucket in worker processes
+        self._key = uuid.uuid4().hex
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (
+            _process_bucket,
+            (self._key, self.rate / self.shares, self.burst / self.shares),
+        )
+
+    def take(self, amount: float) -> None:
+        """Wait until ``amount`` can be used without going over the rate."""
+        with self._lock:
+            now = self.clock()
+            tokens = self._tokens + (now - self._last) * self.rate
+            self._tokens = min(tokens, self.burst) - amount
+            self._last = now
+            wait = -self._tokens / self.rate
+        if wait > 0:
+            self.sleep(wait)
+
+    def throttle(self, chunks: Iterable[Any]) -> Iterator[Any]:
+        """Yield ``chunks``, taking their length from the bucket first."""
+        for chunk in chunks:
+            self.take(len(chunk))
+            yield chunk
+
+
+@functools.cache
+def _process_bucket(key: str, rate: float, burst: float) -> TokenBucket:
+    return TokenBucket(rate, burst)
@@ -0,0 +1,132 @@
+# Copyright 2013 Walter Scheper
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from typing import IO
+import fnmatch
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+
+def _matcher(patterns: Sequence[str]) -> Callable[[str, str], bool]:
+    """Build a predicate that tests a name and relative path against globs.
+
+    Patterns containing a ``/`` are matched against the path relative to the
+    directory being walked, all other patterns against the entry's name.
+    """
+    path_patterns = [p.strip("/") for p in patterns if "/" in p]
+    name_patterns = [p for p in patterns if "/" not in p]
+
+    def match(name: str, relpath: str) -> bool:
+        return any(fnmatch.fnmatchcase(name, p) for p in name_patterns) or any(
+            fnmatch.fnmatchcase(relpath, p) for p in path_patterns
+        )
+
+    return match
+
+
+def walk(
+    paths: Iterable[str],
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    sort: bool = True,
+    onerror: Callable[[OSError], None] | None = None,
+) -> Iterator[str]:
+    """Yield the files in ``paths``, descending into any directories.
+
+    Directories are read with ``os.scandir`` one at a time, so paths are
+    produced as they are discovered and the type information in each
+    ``DirEntry`` saves a ``stat`` per entry. Symbolic links to directories are
+    not followed. With ``sort``, the entries of each directory are visited in
+    name order, otherwise in the order the operating system returns them.
+
+    Files are only yielded if they match one of the ``include`` globs, when
+    given, and none of the ``exclude`` globs. Excluded directories are not
+    descended into.
+    """
+    included = _matcher(include) if include else None
+    excluded = _matcher(exclude) if exclude else None
+
+    for top in paths:
+        if top == "-" or not os.path.isdir(top):
+            yield top
+            continue
+
+        # a stack of iterators over directory entries, one per level
+        stack: list[Iterator[tuple[os.DirEntry[str], str]]] = []
+        stack.append(_scandir(top, "", sort, onerror))
+        while stack:
+            item = next(stack[-1], None)
+            if item is None:
+                stack.pop()
+                continue
+
+            entry, relpath = item
+            if excluded is not None and excluded(entry.name, relpath):
+                continue
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                is_file = not is_dir and entry.is_file()
+            except OSError as e:
+                if onerror is not None:
+                    onerror(e)
+                continue
+
+            if is_dir:
+                stack.append(_scandir(entry.path, relpath, sort, onerror))
+            elif is_file and (included is None or included(entry.name, relpath)):
+                yield entry.path
+
+
+def _scandir(
+    path: str,
+    relpath: str,
+    sort: bool,
+    onerror: Callable[[OSError], None] | None,
+) -> Iterator[tuple[os.DirEntry[str], str]]:
+    try:
+        with os.scandir(path) as it:
+            entries: Iterable[os.DirEntry[str]] = it
+            if sort:
+                entries = sorted(it, key=lambda entry: entry.name)
+            for entry in entries:
+                yield entry, f"{relpath}/{entry.name}" if relpath else entry.name
+    except OSError as e:
+        log.debug("unable to read directory '%s': %s", path, e)
+        if onerror is not None:
+            onerror(e)
+
+
+def read_paths(
+    file_object: IO[bytes], null: bool = False, chunk_size: int = 64 * 1024
+) -> Iterator[str]:
+    """Lazily yield the paths listed in ``file_object``.
+
+    Paths are separated by newlines, or by NUL bytes if ``null`` is set, and
+    decoded with the filesystem encoding. Empty entries are skipped.
+    """
+    sep = b"\0" if null else b"\n"
+    pending = b""
+    while chunk := file_object.read(chunk_size):
+        parts = (pending + chunk).split(sep)
+        pending = parts.pop()
+        for part in parts:
+            if part:
+                yield os.fsdecode(part)
+    if pending:
+        yield os.fsdecode(pending)
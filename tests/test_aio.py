@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+
+import pytest
+
+from hasher.aio import AsyncHasher
+from hasher.hashes import SHA256Hasher, SHA256TreeHasher
+
+
+def test_hash_paths(tmp_path):
+    files = []
+    for i in range(10):
+        path = tmp_path / f"{i}.txt"
+        path.write_bytes(b"data %d\n" % i)
+        files.append(str(path))
+    files.insert(3, str(tmp_path / "missing"))
+
+    async def paths():
+        for fname in files:
+            await asyncio.sleep(0)
+            yield fname
+
+    async def collect(source):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            hasher = AsyncHasher(SHA256Hasher, jobs=3, executor=executor)
+            return [result async for result in hasher.hash_paths(source)]
+
+    for source in (files, paths()):
+        results = asyncio.run(collect(source))
+        assert files == [result.path for result in results]
+        assert isinstance(results[3].error, FileNotFoundError)
+        assert "FAILED open or read" == results[3].status
+        assert hashlib.sha256(b"data 0\n").digest() == results[0].digest
+        assert hashlib.sha256(b"data 9\n").hexdigest() == results[-1].hexdigest
+        assert all(result.ok for result in results[:3] + results[4:])
+
+
+def test_hash_paths_backpressure(tmp_path):
+    (tmp_path / "a").write_bytes(b"a")
+    taken = []
+
+    def paths():
+        for i in range(100):
+            taken.append(i)
+            yield str(tmp_path / "a")
+
+    async def first():
+        results = AsyncHasher(SHA256Hasher, jobs=2).hash_paths(paths())
+        result = await anext(results)
+        await results.aclose()
+        return result
+
+    assert hashlib.sha256(b"a").hexdigest() == asyncio.run(first()).hexdigest
+    assert [0, 1] == taken
+
+
+@pytest.mark.parametrize("sizes", [[], [10], [100_000, 10, 200_000, 3]])
+def test_hash_stream(sizes):
+    chunks = [bytes([i]) * size for i, size in enumerate(sizes)]
+
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    digest = asyncio.run(AsyncHasher(SHA256Hasher).hash_stream(stream()))
+    assert hashlib.sha256(b"".join(chunks)).hexdigest() == digest
+
+
+def test_hash_stream_not_streaming():
+    async def stream():
+        yield b""
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(AsyncHasher(SHA256TreeHasher).hash_stream(stream()))
+
+
+def test_hash_path(tmp_path):
+    (tmp_path / "a").write_bytes(b"a\r\n")
+    hasher = AsyncHasher(SHA256Hasher, binary=False)
+    assert hashlib.sha256(b"a\n").hexdigest() == asyncio.run(
+        hasher.hash_path(str(tmp_path / "a"))
+    )
@@ -1,13 +1,22 @@
 from __future__ import annotations
 
 from pathlib import Path
+import hashlib
+import json
+import os
+import re
+import stat
+import sys
+import time
 
 from click.testing import CliRunner
 import pytest
 
 from hasher.app import hasher
+from hasher.hashes import HASHERS
 
 
+@pytest.mark.skipif("blake3" in HASHERS, reason="optional blake3 is installed")
 def test_hasher_usage():
     runner = CliRunner()
     result = runner.invoke(hasher)
@@ -23,9 +32,22 @@ Options:
   --help                Show this message and exit.
 
 Commands:
-  md5     Generate or check md5 hashes
-  sha1    Generate or check sha1 hashes
-  sha256  Generate or check sha256 hashes
+  bench        Benchmark hashing throughput on generated files
+  blake2b      Generate or check blake2b hashes
+  blake2s      Generate or check blake2s hashes
+  dupes        Find files with the same content
+  md5          Generate or check md5 hashes
+  multi        Generate several kinds of hashes with one pass over each file
+  sha1         Generate or check sha1 hashes
+  sha224       Generate or check sha224 hashes
+  sha256       Generate or check sha256 hashes
+  sha256-tree  Generate or check sha256 tree hashes of large files
+  sha3-224     Generate or check sha3-224 hashes
+  sha3-256     Generate or check sha3-256 hashes
+  sha3-384     Generate or check sha3-384 hashes
+  sha3-512     Generate or check sha3-512 hashes
+  sha384       Generate or check sha384 hashes
+  sha512       Generate or check sha512 hashes
 """
         == result.stderr
     )
@@ -132,3 +154,738 @@ def test_check_strict(hash: str, checksum: str):
             f"hasher {hash}: WARNING: 1 computed checksum did NOT match\n"
             == result.stderr
         )
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+@pytest.mark.parametrize("hash,expected", test_inputs)
+def test_file_jobs(hash: str, expected: str, executor: str):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        names = [f"test{i}.txt" for i in range(20)]
+        for name in names:
+            Path(name).write_text("test\n")
+        result = runner.invoke(
+            hasher, [hash, "--jobs", "4", "--executor", executor, *names]
+        )
+        assert 0 == result.exit_code, result.output
+        assert "".join(f"{expected}  {name}\n" for name in names) == result.stdout
+
+
+@pytest.mark.parametrize("hash,checksum", test_inputs)
+def test_check_jobs(hash: str, checksum: str):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("test1.txt").write_text("test\n")
+        Path("test2.txt").write_text("test\n")
+        Path("checksums.txt").write_text(
+            f"{checksum}  test1.txt\n"
+            f"{checksum}  missing.txt\n"
+            f"{checksum.replace('2', '3')}  test2.txt\n"
+        )
+        result = runner.invoke(hasher, [hash, "--check", "-j", "3", "checksums.txt"])
+        assert 0 == result.exit_code, result.output
+        assert (
+            "test1.txt: OK\nmissing.txt: FAILED open or read\ntest2.txt: FAILED\n"
+            == result.stdout
+        )
+
+
+@pytest.mark.parametrize("chunk_size", ["1", "3", "1K", "2MiB"])
+@pytest.mark.parametrize("hash,expected", test_inputs)
+def test_file_chunk_size(hash: str, expected: str, chunk_size: str):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("test.txt").write_text("test\n")
+        result = runner.invoke(
+            hasher, [hash, "--binary", "--chunk-size", chunk_size, "test.txt"]
+        )
+        assert 0 == result.exit_code, result.output
+        assert f"{expected} *test.txt\n" == result.stdout
+
+
+def test_file_chunk_size_invalid():
+    runner = CliRunner()
+    result = runner.invoke(hasher, ["md5", "--chunk-size", "lots"])
+    assert 2 == result.exit_code
+    assert "'lots' is not a valid size" in result.stderr
+
+
+@pytest.mark.parametrize("mode", ["--binary", "--text"])
+@pytest.mark.parametrize("hash,expected", test_inputs)
+def test_file_mmap(hash: str, expected: str, mode: str):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("test.txt").write_text("test\n")
+        result = runner.invoke(
+            hasher, [hash, mode, "--mmap", "--chunk-size", "2", "test.txt"]
+        )
+        assert 0 == result.exit_code, result.output
+        assert f"{expected}" == result.stdout.split()[0]
+
+
+@pytest.mark.parametrize("mode", ["--binary", "--text"])
+@pytest.mark.parametrize("page_cache", ["drop", "bypass"])
+@pytest.mark.parametrize("hash,expected", test_inputs)
+def test_file_page_cache(hash: str, expected: str, mode: str, page_cache: str):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("test.txt").write_text("test\n")
+        result = runner.invoke(
+            hasher, [hash, mode, "--page-cache", page_cache, "test.txt"]
+        )
+        assert 0 == result.exit_code, result.output
+        assert f"{expected}" == result.stdout.split()[0]
+
+        result = runner.invoke(
+            hasher, [hash, "--page-cache", "bypass", "--mmap", "test.txt"]
+        )
+        assert isinstance(result.exception, RuntimeError)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_file_throttle(executor: str):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        names = [f"test{i}.txt" for i in range(5)]
+        for name in names:
+            Path(name).write_bytes(b"a" * 10_000)
+        expected = hashlib.md5(b"a" * 10_000).hexdigest()
+        for option, value in [("--max-rate", "100K"), ("--max-files-per-sec", "20")]:
+            start = time.monotonic()
+            result = runner.invoke(
+                hasher,
+                ["md5", option, value, "-j", "2", "--executor", executor, *names],
+            )
+            assert 0 == result.exit_code, result.output
+            assert "".join(f"{expected}  {name}\n" for name in names) == (result.stdout)
+            assert time.monotonic() - start >= 0.1
+
+
+def test_multi():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("test.txt").write_text("test\n")
+        result = runner.invoke(hasher, ["multi", "test.txt"])
+        assert 0 == result.exit_code, result.output
+        assert (
+            "".join(
+                f"{hash.upper()} (test.txt) = {expected}\n"
+                for hash, expected in test_inputs
+            )
+            == result.stdout
+        )
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_multi_output_dir(jobs: str):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("out").mkdir()
+        Path("test1.txt").write_text("test\n")
+        Path("test2.txt").write_text("test\n")
+        result = runner.invoke(
+            hasher,
+            ["multi", "--algo", "sha256,md5", "-o", "out", "-j", jobs]
+            + ["test1.txt", "test2.txt"],
+        )
+        assert 0 == result.exit_code, result.output
+        assert "" == result.stdout
+        assert not Path("out/SHA1SUMS").exists()
+        for hash, expected in test_inputs[::2]:
+            manifest = Path(f"out/{hash.upper()}SUMS").read_text()
+            assert f"{expected}  test1.txt\n{expected}  test2.txt\n" == manifest
+            result = runner.invoke(hasher, [hash, "-c", f"out/{hash.upper()}SUMS"])
+            assert "test1.txt: OK\ntest2.txt: OK\n" == result.stdout
+
+
+@pytest.mark.skipif(
+    sys.platform in ("darwin", "win32"), reason="requires bytes file names"
+)
+def test_multi_output_dir_undecodable_name():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("out").mkdir()
+        Path("d").mkdir()
+        with open(b"d/bad\xffname", "wb") as fobj:
+            fobj.write(b"test\n")
+        result = runner.invoke(
+            hasher, ["multi", "--algo", "md5", "-o", "out", "-r", "d"]
+        )
+        assert 0 == result.exit_code, result.output
+        expected = hashlib.md5(b"test\n").hexdigest().encode()
+        assert expected + b"  d/bad\xffname\n" == Path("out/MD5SUMS").read_bytes()
+
+
+def test_multi_unknown_algorithm():
+    runner = CliRunner()
+    result = runner.invoke(hasher, ["multi", "--algo", "md5,crc32"])
+    assert 2 == result.exit_code
+    assert "unknown hash 'crc32'" in result.stderr
+
+
+@pytest.mark.parametrize("hash,expected", test_inputs)
+def test_file_cache(hash: str, expected: str):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("test.txt").write_text("test\n")
+        os.utime("test.txt", ns=(10**18, 10**18))
+        result = runner.invoke(hasher, [hash, "--cache", "cache.db", "test.txt"])
+        assert 0 == result.exit_code, result.output
+        assert f"{expected}  test.txt\n" == result.stdout
+
+        # change the contents without changing the file's identity
+        Path("test.txt").write_text("TEST\n")
+        os.utime("test.txt", ns=(10**18, 10**18))
+        result = runner.invoke(hasher, [hash, "--cache", "cache.db", "test.txt"])
+        assert f"{expected}  test.txt\n" == result.stdout
+
+        for option in ("--no-cache", "--refresh-cache"):
+            result = runner.invoke(
+                hasher, [hash, "--cache", "cache.db", option, "test.txt"]
+            )
+            assert f"{expected}  test.txt\n" != result.stdout
+
+
+@pytest.mark.parametrize("hash,expected", test_inputs)
+def test_recursive(hash: str, expected: str):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("dir/sub").mkdir(parents=True)
+        for name in ("dir/b.txt", "dir/a.txt", "dir/sub/c.txt", "dir/sub/d.log"):
+            Path(name).write_text("test\n")
+        result = runner.invoke(hasher, [hash, "dir"])
+        assert 2 == result.exit_code
+        assert "File 'dir' is a directory." in result.stderr
+
+        result = runner.invoke(hasher, [hash, "-r", "--exclude", "*.log", "dir"])
+        assert 0 == result.exit_code, result.output
+        assert (
+            f"{expected}  dir/a.txt\n{expected}  dir/b.txt\n{expected}  dir/sub/c.txt\n"
+            == result.stdout
+        )
+
+
+@pytest.mark.parametrize("null", [False, True])
+@pytest.mark.parametrize("hash,expected", test_inputs)
+def test_files_from(hash: str, expected: str, null: bool):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("test1.txt").write_text("test\n")
+        Path("test 2.txt").write_text("test\n")
+        sep = "\0" if null else "\n"
+        args = [hash, "--files-from", "-", "test1.txt"] + (["-0"] if null else [])
+        result = runner.invoke(
+            hasher, args, input=f"test 2.txt{sep}missing.txt{sep}test1.txt"
+        )
+        # the manifest is incomplete
+        assert 1 == result.exit_code, result.output
+        assert (
+            f"{expected}  test1.txt\n{expected}  test 2.txt\n{expected}  test1.txt\n"
+            == result.stdout
+        )
+        assert (
+            f"hasher {hash}: missing.txt: No such file or directory\n" == result.stderr
+        )
+
+
+def test_read_error_exit_status():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("f1").write_text("f1\n")
+
+        result = runner.invoke(hasher, ["md5", "--files-from", "-"], input="f1\n")
+        assert 0 == result.exit_code, result.output
+        result = runner.invoke(hasher, ["md5", "--files-from", "-"], input="f1\nnope\n")
+        assert 1 == result.exit_code, result.output
+        result = runner.invoke(
+            hasher, ["md5", "--update", "SUMS", "--files-from", "-"], input="f1\nnope\n"
+        )
+        assert 1 == result.exit_code, result.output
+        assert f"{hashlib.md5(b'f1' + bytes([10])).hexdigest()}  f1\n" == (
+            Path("SUMS").read_text()
+        )
+        result = runner.invoke(
+            hasher, ["multi", "--algo", "md5,sha1", "--files-from", "-"], input="nope\n"
+        )
+        assert 1 == result.exit_code, result.output
+
+
+@pytest.mark.parametrize("jobs", ["1", "4"])
+def test_sha256_tree(jobs: str):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        data = os.urandom(3 * 1024 * 1024 + 5)
+        Path("big.bin").write_bytes(data)
+        result = runner.invoke(hasher, ["sha256-tree", "-j", jobs, "big.bin"])
+        assert 0 == result.exit_code, result.output
+        assert result.stdout.startswith("SHA256-TREE (big.bin) = ")
+        digest = result.stdout.split()[-1]
+
+        result = runner.invoke(hasher, ["sha256-tree"], input=data)
+        assert f"SHA256-TREE (-) = {digest}\n" == result.stdout
+
+        result = runner.invoke(
+            hasher, ["sha256-tree", "-j", jobs, "--page-cache", "drop", "big.bin"]
+        )
+        assert f"SHA256-TREE (big.bin) = {digest}\n" == result.stdout
+
+        Path("SUMS").write_text(
+            f"SHA256-TREE (big.bin) = {digest}\n{digest}  big.bin\n"
+        )
+        result = runner.invoke(hasher, ["sha256-tree", "-j", jobs, "-c", "SUMS"])
+        assert "big.bin: OK\n" == result.stdout
+        assert (
+            "hasher sha256-tree: WARNING: 1 line is improperly formatted\n"
+            == result.stderr
+        )
+
+
+def test_sha256_tree_reuses_digests():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        for name in ("a", "b"):
+            Path(name).write_text(f"{name}\n")
+            os.utime(name, (0, 0))
+        stats_args = ["--stats", "--stats-format=json", "--stats-file=stats.json"]
+
+        # in the default text mode
+        result = runner.invoke(hasher, ["sha256-tree", "--update", "SUMS", "a", "b"])
+        assert 0 == result.exit_code, result.output
+        future = time.time() + 3600
+        os.utime("SUMS", (future, future))
+        result = runner.invoke(
+            hasher, ["sha256-tree", "--update", "SUMS", *stats_args, "a", "b"]
+        )
+        assert 0 == result.exit_code, result.output
+        assert 0 == json.loads(Path("stats.json").read_text())["bytes"]
+
+        result = runner.invoke(hasher, ["sha256-tree", "--cache", "cache.db", "a", "b"])
+        assert 0 == result.exit_code, result.output
+        Path("SUMS").write_text(result.stdout)
+        result = runner.invoke(
+            hasher, ["sha256-tree", "-c", "--cache", "cache.db", *stats_args, "SUMS"]
+        )
+        assert "a: OK\nb: OK\n" == result.stdout
+        assert 0 == json.loads(Path("stats.json").read_text())["bytes"]
+
+
+@pytest.mark.parametrize(
+    "algorithm", sorted(hashlib.algorithms_guaranteed - {"shake_128", "shake_256"})
+)
+def test_registered_algorithms(algorithm: str):
+    name = algorithm.replace("_", "-")
+    expected = hashlib.new(algorithm, b"test\n").hexdigest()
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("test.txt").write_text("test\n")
+        result = runner.invoke(hasher, [name, "test.txt"])
+        assert 0 == result.exit_code, result.output
+        assert f"{expected}  test.txt\n" == result.stdout
+
+        Path("SUMS").write_text(result.stdout + f"{expected}0  test.txt\n")
+        result = runner.invoke(hasher, [name, "-c", "SUMS"])
+        assert "test.txt: OK\n" == result.stdout
+        assert (
+            f"hasher {name}: WARNING: 1 line is improperly formatted\n" == result.stderr
+        )
+
+
+def test_multi_streaming_only():
+    runner = CliRunner()
+    result = runner.invoke(hasher, ["multi", "--algo", "sha512,sha256-tree"])
+    assert 2 == result.exit_code
+    assert "unknown hash 'sha256-tree'" in result.stderr
+
+
+@pytest.mark.parametrize("args", [[], ["-j", "2"], ["-c"]])
+def test_stats(args: list[str]):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("test.txt").write_text("test\n")
+        Path("SUMS").write_text("d8e8fca2dc0f896fd7cb4cb0031ba249  test.txt\n")
+        files = ["SUMS"] if "-c" in args else ["test.txt"]
+        result = runner.invoke(hasher, ["md5", "--stats", *args, *files])
+        assert 0 == result.exit_code, result.output
+        assert result.stderr.startswith("hasher md5: 1 files (0 failed), 5 bytes in ")
+
+        result = runner.invoke(
+            hasher,
+            ["md5", "--stats", "--stats-format=json", "--stats-file=stats.json"]
+            + args
+            + files,
+        )
+        assert "" == result.stderr
+        stats = json.loads(Path("stats.json").read_text())
+        assert {"files": 1, "errors": 0, "bytes": 5} == {
+            key: stats[key] for key in ("files", "errors", "bytes")
+        }
+        assert ["test.txt"] == [item["path"] for item in stats["slowest"]]
+
+
+@pytest.mark.parametrize("args", [["-r", "d"], ["-c", "SUMS"], ["-j", "2", "d/a"]])
+def test_progress(args: list[str]):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("d").mkdir()
+        Path("d/a").write_text("test\n")
+        Path("SUMS").write_text("d8e8fca2dc0f896fd7cb4cb0031ba249  d/a\n")
+        result = runner.invoke(hasher, ["md5", "--progress", *args])
+        assert 0 == result.exit_code, result.output
+        # the total is only shown if it was counted before the end
+        assert re.match(r"0\.0 MB, 1(/1)? files, [0-9.]+ MB/s, ", result.stderr)
+
+
+def test_text_mode_bytes():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("unix.txt").write_bytes(b"caf\xe9\nline\n")
+        Path("dos.txt").write_bytes(b"caf\xe9\r\nline\r\n")
+        expected = hashlib.md5(b"caf\xe9\nline\n").hexdigest()
+
+        result = runner.invoke(hasher, ["md5", "unix.txt", "dos.txt"])
+        assert 0 == result.exit_code, result.output
+        assert f"{expected}  unix.txt\n{expected}  dos.txt\n" == result.stdout
+
+        binary = hashlib.md5(b"caf\xe9\r\nline\r\n").hexdigest()
+        result = runner.invoke(hasher, ["md5", "-b", "dos.txt"])
+        assert f"{binary} *dos.txt\n" == result.stdout
+
+
+def test_update():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("d").mkdir()
+        for name in ("a", "b", "c"):
+            Path("d", name).write_text(f"{name}\n")
+        digests = {
+            name: hashlib.md5(f"{name}\n".encode()).hexdigest()
+            for name in ("a", "b", "c", "e")
+        }
+
+        result = runner.invoke(hasher, ["md5", "--update", "SUMS", "-r", "d"])
+        assert 0 == result.exit_code, result.output
+        assert "" == result.stdout
+        assert (
+            "".join(f"{digests[name]}  d/{name}\n" for name in ("a", "b", "c"))
+            == Path("SUMS").read_text()
+        )
+        Path("SUMS").chmod(0o640)
+
+        # unchanged since the manifest was written, so the digest is reused
+        Path("SUMS").write_text(
+            f"{'0' * 32}  d/a\n{digests['b']}  d/b\n{digests['c']}  d/c\n"
+        )
+        future = time.time() + 3600
+        os.utime("SUMS", (future, future))
+        Path("d/c").unlink()
+        Path("d/e").write_text("e\n")
+        result = runner.invoke(hasher, ["md5", "--update", "SUMS", "-r", "d"])
+        assert 0 == result.exit_code, result.output
+        assert (
+            f"{'0' * 32}  d/a\n{digests['b']}  d/b\n{digests['e']}  d/e\n"
+            == Path("SUMS").read_text()
+        )
+        assert 0o640 == stat.S_IMODE(os.stat("SUMS").st_mode)
+
+        # modified since the manifest was written, so they are rehashed
+        os.utime("SUMS", (0, 0))
+        result = runner.invoke(hasher, ["md5", "--update", "SUMS", "d/a", "d/e"])
+        assert 0 == result.exit_code, result.output
+        assert f"{digests['a']}  d/a\n{digests['e']}  d/e\n" == (
+            Path("SUMS").read_text()
+        )
+        assert ["SUMS", "d"] == sorted(os.listdir())
+
+        result = runner.invoke(hasher, ["md5", "-c", "--update", "SUMS", "SUMS"])
+        assert isinstance(result.exception, RuntimeError)
+
+
+def test_update_modified_during_run(mocker):
+    from hasher.hashes import Hasher
+
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("a").write_text("a\n")
+        Path("b").write_text("b\n")
+        hash_path = Hasher._hash_path
+        changed = []
+
+        def hash_then_modify(self, fname, binary=False):
+            result = hash_path(self, fname, binary)
+            if fname == "a":
+                Path("a").write_text("changed\n")
+                changed.append(time.time_ns())
+                # well before the run ends
+                time.sleep(0.1)
+            return result
+
+        mocker.patch.object(
+            Hasher, "_hash_path", autospec=True, side_effect=hash_then_modify
+        )
+        result = runner.invoke(hasher, ["md5", "--update", "SUMS", "a", "b"])
+        assert 0 == result.exit_code, result.output
+        assert Path("SUMS").read_text().startswith(hashlib.md5(b"a\n").hexdigest())
+        # the manifest is dated from the start of the run, not its end
+        assert os.stat("SUMS").st_mtime_ns <= changed[0]
+
+        mocker.stopall()
+        result = runner.invoke(hasher, ["md5", "--update", "SUMS", "a", "b"])
+        assert 0 == result.exit_code, result.output
+        assert (
+            Path("SUMS").read_text().startswith(hashlib.md5(b"changed\n").hexdigest())
+        )
+
+
+def test_update_recursive_in_manifest_directory():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("a").write_text("a\n")
+        Path("d").mkdir()
+        Path("d", "b").write_text("b\n")
+        expected = (
+            f"{hashlib.sha256(b'a' + bytes([10])).hexdigest()}  ./a\n"
+            f"{hashlib.sha256(b'b' + bytes([10])).hexdigest()}  ./d/b\n"
+        )
+
+        for _ in range(2):
+            result = runner.invoke(
+                hasher, ["sha256", "-r", ".", "--update", "SHA256SUMS"]
+            )
+            assert 0 == result.exit_code, result.output
+            # neither the manifest nor the file replacing it is listed
+            assert expected == Path("SHA256SUMS").read_text()
+        assert ["SHA256SUMS", "a", "d"] == sorted(os.listdir())
+
+
+@pytest.mark.parametrize("order", ["inode", "extent"])
+def test_check_read_order(order: str):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        names = [f"test{i}.txt" for i in range(10)]
+        for name in reversed(names):
+            Path(name).write_text(f"{name}\n")
+        Path("SUMS").write_text(
+            "".join(
+                f"{hashlib.md5(f'{name}{chr(10)}'.encode()).hexdigest()}  {name}\n"
+                for name in names
+            )
+            + f"{'0' * 32}  missing.txt\n"
+        )
+        args = ["md5", "-c", "--read-order", order, "-j", "3", "SUMS"]
+        result = runner.invoke(hasher, args)
+        assert 0 == result.exit_code, result.output
+        assert (
+            "".join(f"{name}: OK\n" for name in names)
+            + "missing.txt: FAILED open or read\n"
+            == result.stdout
+        )
+
+        result = runner.invoke(hasher, [*args, "--quiet"])
+        assert "missing.txt: FAILED open or read\n" == result.stdout
+
+        result = runner.invoke(hasher, ["md5", "--read-order", order, "SUMS"])
+        assert isinstance(result.exception, RuntimeError)
+
+
+def test_check_checkpoint():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("test.txt").write_text("test\n")
+        Path("SUMS").write_text(f"{hashlib.md5(b'test').hexdigest()}  test.txt\n")
+
+        result = runner.invoke(
+            hasher, ["md5", "-c", "--checkpoint", "CHECKPOINT", "--resume", "SUMS"]
+        )
+        assert 0 == result.exit_code, result.output
+        assert "test.txt: FAILED\n" == result.stdout
+        # the checkpoint is only kept while there is something to resume
+        assert not Path("CHECKPOINT").exists()
+
+        result = runner.invoke(hasher, ["md5", "-c", "--resume", "SUMS"])
+        assert isinstance(result.exception, RuntimeError)
+        result = runner.invoke(hasher, ["md5", "--checkpoint", "CHECKPOINT", "SUMS"])
+        assert isinstance(result.exception, RuntimeError)
+
+
+@pytest.mark.parametrize("kind", ["release.tar.gz", "release.zip"])
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_archive(kind: str, jobs: str):
+    import io
+    import tarfile
+    import zipfile
+
+    members = {"pkg/a.txt": b"a\r\n", "pkg/b.txt": b"b\n"}
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        if kind.endswith(".zip"):
+            with zipfile.ZipFile(kind, "w") as zf:
+                for name, data in members.items():
+                    zf.writestr(name, data)
+        else:
+            with tarfile.open(kind, "w:gz") as tf:
+                for name, data in members.items():
+                    info = tarfile.TarInfo(name)
+                    info.size = len(data)
+                    tf.addfile(info, io.BytesIO(data))
+        Path("plain.txt").write_text("plain\n")
+
+        result = runner.invoke(
+            hasher, ["md5", "--archive", "-b", "-j", jobs, kind, "plain.txt"]
+        )
+        assert 1 == result.exit_code, result.output
+        assert (
+            "".join(
+                f"{hashlib.md5(data).hexdigest()} *{kind}!{name}\n"
+                for name, data in members.items()
+            )
+            == result.stdout
+        )
+        assert "Unreadable archive" in result.stderr
+
+        result = runner.invoke(hasher, ["md5", "--archive", kind])
+        assert hashlib.md5(b"a\n").hexdigest() == result.stdout.split()[0]
+
+        plain = hashlib.md5(b"plain\n").hexdigest()
+        Path("SUMS").write_text(
+            result.stdout
+            + f"{plain}  plain.txt\n"
+            + f"{hashlib.md5(b'b').hexdigest()}  {kind}!pkg/b.txt\n"
+            + f"{hashlib.md5(b'c').hexdigest()}  {kind}!pkg/c.txt\n"
+        )
+        result = runner.invoke(hasher, ["md5", "-c", "--archive", "-j", jobs, "SUMS"])
+        assert 0 == result.exit_code, result.output
+        assert (
+            f"{kind}!pkg/a.txt: OK\n"
+            f"{kind}!pkg/b.txt: OK\n"
+            "plain.txt: OK\n"
+            f"{kind}!pkg/b.txt: FAILED\n"
+            f"{kind}!pkg/c.txt: FAILED open or read\n"
+        ) == result.stdout
+
+        result = runner.invoke(hasher, ["md5", "--archive", "--update", "SUMS", kind])
+        assert isinstance(result.exception, RuntimeError)
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["md5", "-b", "--mmap", "--chunk-size", "2"],
+        ["md5", "-b", "--page-cache", "drop"],
+        ["md5", "-t", "--page-cache", "bypass"],
+        ["sha256-tree"],
+    ],
+)
+def test_archive_io_options(args: list[str]):
+    import io
+    import tarfile
+
+    data = b"some data\n" * 10
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with tarfile.open("p.tar", "w") as tf:
+            info = tarfile.TarInfo("x")
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+        expected = runner.invoke(hasher, args, input=data).stdout
+
+        result = runner.invoke(hasher, [*args, "--archive", "p.tar"])
+        assert 0 == result.exit_code, result.output
+        # the member is hashed like the same bytes on stdin
+        digest = re.search("[0-9a-f]{32,}", expected)
+        assert digest is not None
+        assert digest.group() in result.stdout
+        assert "p.tar!x" in result.stdout
+
+
+def test_archive_encrypted_member():
+    import zipfile
+
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with zipfile.ZipFile("enc.zip", "w") as zf:
+            zf.writestr("secret", b"secret")
+            zf.writestr("plain", b"plain")
+        data = bytearray(Path("enc.zip").read_bytes())
+        for signature, offset in ((b"PK\x03\x04", 6), (b"PK\x01\x02", 8)):
+            data[data.index(signature) + offset] |= 0x1
+        Path("enc.zip").write_bytes(data)
+
+        result = runner.invoke(hasher, ["md5", "--archive", "-b", "enc.zip"])
+        assert 1 == result.exit_code, result.output
+        assert f"{hashlib.md5(b'plain').hexdigest()} *enc.zip!plain\n" == (
+            result.stdout
+        )
+        assert "hasher md5: enc.zip!secret: Encrypted archive member\n" == (
+            result.stderr
+        )
+
+
+def test_check_archive_read_errors():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Path("junk.tar").write_bytes(b"not an archive")
+        Path("SUMS").write_text(f"{'0' * 32}  junk.tar!x\n{'0' * 32}  missing\n")
+
+        result = runner.invoke(hasher, ["md5", "-c", "--archive", "SUMS"])
+        assert 0 == result.exit_code, result.output
+        lines = result.stderr.splitlines()
+        assert lines[0].startswith("hasher md5: junk.tar!x: Unreadable archive (")
+        assert "hasher md5: missing: No such file or directory" == lines[1]
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_archive_stats(jobs: str):
+    import io
+    import tarfile
+
+    members = {"a": b"a" * 10, "b": b"b" * 20}
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        for archive in ("one.tar", "two.tar"):
+            with tarfile.open(archive, "w") as tf:
+                for name, data in members.items():
+                    info = tarfile.TarInfo(name)
+                    info.size = len(data)
+                    tf.addfile(info, io.BytesIO(data))
+        Path("plain").write_bytes(b"plain")
+        digests = {
+            name: hashlib.md5(data).hexdigest() for name, data in members.items()
+        }
+        # the members of one.tar are not listed together, so it is read twice
+        Path("SUMS").write_text(
+            f"{digests['a']} *one.tar!a\n"
+            f"{digests['a']} *two.tar!a\n"
+            f"{digests['b']} *two.tar!b\n"
+            f"{hashlib.md5(b'plain').hexdigest()} *plain\n"
+            f"{digests['b']} *one.tar!b\n"
+        )
+        stats_args = ["--stats", "--stats-format=json", "--stats-file=stats.json"]
+
+        result = runner.invoke(
+            hasher, ["md5", "--archive", "-b", "-j", jobs, *stats_args, "one.tar"]
+        )
+        assert 0 == result.exit_code, result.output
+        stats = json.loads(Path("stats.json").read_text())
+        assert {"files": 1, "errors": 0, "bytes": 30} == {
+            key: stats[key] for key in ("files", "errors", "bytes")
+        }
+        assert ["one.tar"] == [item["path"] for item in stats["slowest"]]
+
+        result = runner.invoke(
+            hasher, ["md5", "-c", "--archive", "-j", jobs, *stats_args, "SUMS"]
+        )
+        assert 0 == result.exit_code, result.output
+        assert (
+            "one.tar!a: OK\ntwo.tar!a: OK\ntwo.tar!b: OK\nplain: OK\none.tar!b: OK\n"
+            == result.stdout
+        )
+        stats = json.loads(Path("stats.json").read_text())
+        assert {"files": 4, "errors": 0, "bytes": 95} == {
+            key: stats[key] for key in ("files", "errors", "bytes")
+        }
+
+        result = runner.invoke(
+            hasher, ["md5", "-c", "--archive", "-j", jobs, "--progress", "SUMS"]
+        )
+        assert 0 == result.exit_code, result.output
+        assert re.search(r"0\.0 MB, 4(/4)? files, ", result.stderr)
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from hasher.archive import ARCHIVE_ERRORS, iter_members, split_member
+
+MEMBERS = {"pkg/a.txt": b"a\n", "pkg/sub/b.txt": b"b" * 100_000}
+
+
+def write_tar(path, mode="w:gz"):
+    with tarfile.open(path, mode) as tf:
+        directory = tarfile.TarInfo("pkg")
+        directory.type = tarfile.DIRTYPE
+        tf.addfile(directory)
+        for name, data in MEMBERS.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+        link = tarfile.TarInfo("pkg/link")
+        link.type = tarfile.SYMTYPE
+        link.linkname = "a.txt"
+        tf.addfile(link)
+
+
+def write_zip(path):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.mkdir("pkg")
+        for name, data in MEMBERS.items():
+            zf.writestr(name, data)
+
+
+@pytest.mark.parametrize("mode", ["w", "w:gz", "w:bz2", "w:xz"])
+def test_iter_members_tar(tmp_path, mode):
+    path = tmp_path / "release.tar"
+    write_tar(path, mode)
+
+    members = {name: fobj.read() for name, fobj in iter_members(str(path))}
+    assert MEMBERS == members
+
+
+def test_iter_members_zip(tmp_path):
+    path = tmp_path / "release.zip"
+    write_zip(path)
+
+    members = [(name, fobj.read()) for name, fobj in iter_members(str(path))]
+    assert list(MEMBERS.items()) == members
+
+
+def test_iter_members_not_an_archive(tmp_path):
+    path = tmp_path / "data"
+    path.write_bytes(b"not an archive")
+
+    with pytest.raises(ARCHIVE_ERRORS):
+        list(iter_members(str(path)))
+
+
+def test_split_member(tmp_path):
+    archive = tmp_path / "a!b.tar"
+    archive.touch()
+
+    assert (str(archive), "pkg/c!d") == split_member(f"{archive}!pkg/c!d")
+    assert split_member(str(archive)) is None
+    assert split_member(f"{tmp_path / 'missing.tar'}!pkg/c") is None
+    assert split_member("!pkg") is None
+
+
+def test_iter_members_unreadable_zip_members(tmp_path):
+    path = tmp_path / "release.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("secret", b"secret")
+        zf.writestr("packed", b"packed")
+        zf.writestr("plain", b"plain")
+    data = bytearray(path.read_bytes())
+    # flag the first member as encrypted, in its local and central headers
+    for signature, offset in ((b"PK\x03\x04", 6), (b"PK\x01\x02", 8)):
+        data[data.index(signature) + offset] |= 0x1
+    # and give the second an unknown compression method in its central header
+    central = data.index(b"PK\x01\x02", data.index(b"PK\x01\x02") + 1)
+    data[central + 10] = 99
+    path.write_bytes(data)
+
+    members = [
+        (name, fobj if isinstance(fobj, OSError) else fobj.read())
+        for name, fobj in iter_members(str(path))
+    ]
+    assert ["secret", "packed", "plain"] == [name for name, _ in members]
+    assert "Encrypted archive member" == members[0][1].strerror
+    assert f"{path}!packed" == members[1][1].filename
+    assert b"plain" == members[2][1]
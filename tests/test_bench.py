@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+import os
+
+from click.testing import CliRunner
+
+from hasher import bench
+from hasher.app import hasher
+from hasher.hashes import MD5Hasher
+
+
+def test_make_corpus(tmp_path):
+    tiny = bench.make_corpus("tiny", str(tmp_path), scale=0.005)
+    assert 10 == tiny.count == len(tiny.files)
+    assert all(1024 == os.path.getsize(f) for f in tiny.files)
+
+    tree = bench.make_corpus("tree", str(tmp_path), scale=0.2)
+    assert tree.recursive
+    assert 12 == tree.count
+    assert 3 == len(os.listdir(tree.files[0]))
+
+
+def test_bench_check(tmp_path):
+    corpus = bench.make_corpus("manifest", str(tmp_path), scale=0.005)
+    result = bench.bench(corpus, MD5Hasher, 4096, "mmap", repeat=1)
+    assert "manifest" == result.corpus
+    assert "md5" == result.algorithm
+    assert 10 == result.files
+    assert 10 * 1024 == result.bytes
+    assert result.mb_per_s > 0
+    assert (tmp_path / "md5.sums").read_text().count("\n") == 10
+
+
+def test_bench_command(tmp_path):
+    runner = CliRunner()
+    output = tmp_path / "results.json"
+    result = runner.invoke(
+        hasher,
+        [
+            "bench",
+            "--algo=md5,sha1",
+            "--corpus=tiny",
+            "--corpus=huge",
+            "--io=read",
+            "--chunk-size=4K",
+            "--scale=0.001",
+            "--repeat=1",
+            f"--dir={tmp_path}",
+            f"--output={output}",
+        ],
+    )
+    assert 0 == result.exit_code, result.output
+    lines = result.stdout.splitlines()
+    if bench.peak_rss_kib() is not None:
+        assert lines.pop().startswith("peak RSS of all runs: ")
+    assert 4 == len(lines)
+
+    report = json.loads(output.read_text())
+    assert {"hasher", "python", "platform", "cpus", "peak_rss_kib", "results"} <= set(
+        report
+    )
+    assert all("peak_rss_kib" not in r for r in report["results"])
+    assert [("tiny", "md5"), ("tiny", "sha1"), ("huge", "md5"), ("huge", "sha1")] == [
+        (r["corpus"], r["algorithm"]) for r in report["results"]
+    ]
+    assert all(4096 == r["chunk_size"] for r in report["results"])
+    assert all(r["files_per_s"] > 0 for r in report["results"])
+    # the generated files are removed afterwards
+    assert ["results.json"] == os.listdir(tmp_path)
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import os
+import pickle
+
+import pytest
+
+from hasher import cache
+
+
+@pytest.fixture
+def old_file(tmp_path):
+    path = tmp_path / "data.txt"
+    path.write_text("test\n")
+    os.utime(path, ns=(10**18, 10**18))
+    return path
+
+
+def test_get_put(tmp_path, old_file):
+    digests = cache.DigestCache(str(tmp_path / "cache.db"))
+    st = os.stat(old_file)
+
+    assert digests.get("data.txt", "md5:binary", st) is None
+    digests.put("data.txt", "md5:binary", st, "abc")
+    assert "abc" == digests.get("data.txt", "md5:binary", st)
+    assert digests.get("data.txt", "md5:text", st) is None
+
+    os.utime(old_file, ns=(10**18, 10**18 + 1))
+    assert digests.get("data.txt", "md5:binary", os.stat(old_file)) is None
+    digests.close()
+
+
+def test_put_racy(tmp_path):
+    path = tmp_path / "data.txt"
+    path.write_text("test\n")
+    digests = cache.DigestCache(str(tmp_path / "cache.db"))
+    st = os.stat(path)
+
+    digests.put("data.txt", "md5:binary", st, "abc")
+    assert digests.get("data.txt", "md5:binary", st) is None
+
+
+def test_refresh(tmp_path, old_file):
+    path = str(tmp_path / "cache.db")
+    st = os.stat(old_file)
+    digests = cache.DigestCache(path)
+    digests.put("data.txt", "md5:binary", st, "abc")
+    digests.close()
+
+    digests = cache.DigestCache(path, refresh=True)
+    assert digests.get("data.txt", "md5:binary", st) is None
+    digests.close()
+
+    digests = cache.DigestCache(path)
+    assert "abc" == digests.get("data.txt", "md5:binary", st)
+
+
+def test_evict(tmp_path, old_file):
+    path = str(tmp_path / "cache.db")
+    st = os.stat(old_file)
+    digests = cache.DigestCache(path, max_entries=1)
+    digests.put("data.txt", "md5:binary", st, "abc")
+    digests.put("data.txt", "sha1:binary", st, "def")
+    digests.close()
+
+    digests = cache.DigestCache(path, max_age=-1)
+    kinds = [
+        kind for kind in ("md5:binary", "sha1:binary") if digests.get("", kind, st)
+    ]
+    assert 1 == len(kinds)
+    digests.close()
+
+    digests = cache.DigestCache(path)
+    assert digests.get("", kinds[0], st) is None
+
+
+def test_evict_from_workers(tmp_path, old_file):
+    path = str(tmp_path / "cache.db")
+    st = os.stat(old_file)
+    digests = cache.DigestCache(path, max_entries=1)
+    # only a worker process has used the database
+    worker = pickle.loads(pickle.dumps(digests))
+    worker.put("data.txt", "md5:binary", st, "abc")
+    worker.put("data.txt", "sha1:binary", st, "def")
+    digests.close()
+
+    digests = cache.DigestCache(path)
+    kinds = [
+        kind for kind in ("md5:binary", "sha1:binary") if digests.get("", kind, st)
+    ]
+    assert 1 == len(kinds)
+
+
+def test_pickle(tmp_path, old_file, mocker):
+    digests = cache.DigestCache(str(tmp_path / "cache.db"))
+    st = os.stat(old_file)
+    digests.put("data.txt", "md5:binary", st, "abc")
+
+    connect = mocker.spy(cache.sqlite3, "connect")
+    copy = pickle.loads(pickle.dumps(digests))
+    assert "abc" == copy.get("data.txt", "md5:binary", st)
+    # every task sent to a worker process uses the same connection
+    assert copy is pickle.loads(pickle.dumps(digests))
+    assert "abc" == copy.get("data.txt", "md5:binary", st)
+    assert 1 == connect.call_count
+
+
+@pytest.mark.skipif(not hasattr(os, "setxattr"), reason="requires xattr support")
+def test_xattr_get_put(old_file):
+    try:
+        os.setxattr(old_file, "user.hasher.test", b"")
+    except OSError:
+        pytest.skip("filesystem does not support user extended attributes")
+    digests = cache.XattrCache()
+    st = os.stat(old_file)
+
+    digests.put(str(old_file), "md5:text", st, "abc")
+    assert b"5 1000000000000000000 abc" == os.getxattr(old_file, "user.hasher.md5.text")
+
+    assert "abc" == digests.get(str(old_file), "md5:text", st)
+    assert digests.get(str(old_file), "md5:binary", st) is None
+    assert cache.XattrCache(refresh=True).get(str(old_file), "md5:text", st) is None
+
+    old_file.write_text("changed\n")
+    assert digests.get(str(old_file), "md5:text", os.stat(old_file)) is None
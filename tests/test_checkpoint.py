@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+from hasher.checkpoint import Checkpoint, CheckState
+
+
+def test_save_and_resume(tmp_path):
+    manifest = tmp_path / "SUMS"
+    manifest.write_text("sums\n")
+    path = str(tmp_path / "checkpoint")
+
+    checkpoint = Checkpoint(path, "md5")
+    state = checkpoint.start(str(manifest))
+    assert CheckState() == state
+    state.position = 3
+    state.hash_errors = 1
+    checkpoint.save()
+    assert not os.path.exists(f"{path}.tmp")
+
+    resumed = Checkpoint(path, "md5", resume=True).start(str(manifest))
+    assert CheckState(position=3, hash_errors=1) == resumed
+    assert resumed.failed
+    # without resume, the checkpoint is started afresh
+    assert CheckState() == Checkpoint(path, "md5").start(str(manifest))
+
+    manifest.write_text("other sums\n")
+    assert CheckState() == Checkpoint(path, "md5", resume=True).start(str(manifest))
+
+    checkpoint.remove()
+    assert not os.path.exists(path)
+    checkpoint.remove()
+
+
+def test_update_interval(tmp_path):
+    manifest = tmp_path / "SUMS"
+    manifest.write_text("sums\n")
+    path = tmp_path / "checkpoint"
+    now = [0.0]
+
+    checkpoint = Checkpoint(str(path), "md5", interval=10, clock=lambda: now[0])
+    state = checkpoint.start(str(manifest))
+    state.position = 1
+    checkpoint.update()
+    assert not path.exists()
+    now[0] = 10
+    checkpoint.update()
+    assert {"position": 1, "format_errors": 0, "hash_errors": 0, "read_errors": 0} == (
+        json.loads(path.read_text())["manifests"][str(manifest)]["state"]
+    )
+
+
+def test_resume_other_hasher(tmp_path):
+    path = str(tmp_path / "checkpoint")
+    Checkpoint(path, "md5").save()
+
+    with pytest.raises(RuntimeError):
+        Checkpoint(path, "sha1", resume=True)
+    # a missing checkpoint is a fresh start
+    Checkpoint(str(tmp_path / "missing"), "sha1", resume=True)
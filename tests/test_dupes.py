@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import os
+
+from click.testing import CliRunner
+import pytest
+
+from hasher import dupes
+from hasher.app import hasher
+from hasher.dupes import find_duplicates
+from hasher.hashes import SHA256Hasher
+
+
+@pytest.fixture
+def tree(tmp_path):
+    big = os.urandom(20000)
+    files = {
+        "a": b"a\n",
+        "b": b"b\n",
+        "sub/a": b"a\n",
+        "big1": big,
+        "sub/big2": big,
+        # same size, head and tail as big, but different in the middle
+        "big3": big[:10000] + bytes([big[10000] ^ 0xFF]) + big[10001:],
+        "empty1": b"",
+        "empty2": b"",
+    }
+    (tmp_path / "sub").mkdir()
+    for name, data in files.items():
+        (tmp_path / name).write_bytes(data)
+    os.link(tmp_path / "a", tmp_path / "sub" / "link")
+    os.link(tmp_path / "b", tmp_path / "sub" / "b-link")
+    return tmp_path
+
+
+def test_find_duplicates(tree, mocker):
+    sample = mocker.patch("hasher.dupes._sample", wraps=dupes._sample)
+    hasher = SHA256Hasher(mocker.MagicMock(), mocker.MagicMock())
+    hash_files = mocker.spy(hasher, "hash_files")
+    files = sorted(str(path) for path in tree.rglob("*") if path.is_file())
+
+    groups = find_duplicates(hasher, files + [str(tree / "a")])
+
+    assert [
+        sorted(str(tree / name) for name in names)
+        for names in (
+            ["a", "sub/a", "sub/link"],
+            ["big1", "sub/big2"],
+            ["empty1", "empty2"],
+        )
+    ] == groups
+    # only the three large files are sampled, and b is never read
+    assert 3 == sample.call_count
+    hashed = list(hash_files.call_args.args[0])
+    assert str(tree / "b") not in hashed
+
+
+def test_find_duplicates_min_size(tree, mocker):
+    hasher = SHA256Hasher(mocker.MagicMock(), mocker.MagicMock())
+    files = [str(path) for path in tree.rglob("*")]
+    groups = find_duplicates(hasher, files, min_size=3)
+    assert [[str(tree / "big1"), str(tree / "sub/big2")]] == groups
+
+
+@pytest.mark.parametrize("jobs", ["1", "3"])
+def test_dupes_command(tree, jobs):
+    runner = CliRunner()
+    result = runner.invoke(
+        hasher,
+        ["dupes", "-j", jobs, "--exclude", "empty*", "-a", "md5", str(tree)],
+    )
+    assert 0 == result.exit_code, result.output
+    assert (
+        "\n".join(str(tree / name) for name in ("a", "sub/a", "sub/link"))
+        + "\n\n"
+        + "\n".join(str(tree / name) for name in ("big1", "sub/big2"))
+        + "\n"
+    ) == result.stdout
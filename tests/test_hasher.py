@@ -32,7 +32,14 @@ def md5hasher(mocker):
 def args():
     from hasher.app import AttrDict
 
-    return AttrDict(binary=False, warn=False, status=False, quiet=False)
+    return AttrDict(
+        binary=False,
+        warn=False,
+        status=False,
+        quiet=False,
+        read_order="manifest",
+        archive=False,
+    )
 
 
 class TestMD5Hasher:
@@ -49,16 +56,16 @@ class TestMD5Hasher:
 
         with pytest.raises(OSError):
             md5hasher.generate_hash("foo", args)
-        _open.assert_called_once_with("foo", "r")
+        _open.assert_called_once_with("foo", "rb")
 
     def test_generate_display_text(self, mocker, md5hasher, args):
         _open = mocker.patch(
-            "hasher.hashes.open", mocker.mock_open(read_data=self.data)
+            "hasher.hashes.open", mocker.mock_open(read_data=self.data.encode("utf-8"))
         )
 
         md5hasher.generate_hash("foo", args)
 
-        _open.assert_called_once_with("foo", "r")
+        _open.assert_called_once_with("foo", "rb")
         md5hasher.stdout.assert_called_with(f"{self.data_md5}  foo")
 
     def test_generate_display_text_binary(self, mocker, md5hasher, args):
@@ -76,8 +83,8 @@ class TestMD5Hasher:
         _open = mocker.patch("hasher.hashes.open", mocker.mock_open())
         _open.side_effect = [
             io.StringIO(self.check_data),
-            io.StringIO("AUTHORS\n"),
-            io.StringIO("README.rst\n"),
+            io.BytesIO(b"AUTHORS\n"),
+            io.BytesIO(b"README.rst\n"),
         ]
 
         rc = md5hasher.check_hash("foo", args)
@@ -115,8 +122,8 @@ class TestMD5Hasher:
         _open = mocker.patch("hasher.hashes.open", mocker.mock_open())
         _open.side_effect = [
             io.StringIO(self.check_data),
-            io.StringIO("AUTHORS.\n"),
-            io.StringIO("README.rst\n"),
+            io.BytesIO(b"AUTHORS.\n"),
+            io.BytesIO(b"README.rst\n"),
         ]
 
         rc = md5hasher.check_hash("foo", args)
@@ -136,8 +143,8 @@ class TestMD5Hasher:
         _open = mocker.patch("hasher.hashes.open", mocker.mock_open())
         _open.side_effect = [
             io.StringIO(self.check_data),
-            io.StringIO("AUTHORS.\n"),
-            io.StringIO("README.rst.\n"),
+            io.BytesIO(b"AUTHORS.\n"),
+            io.BytesIO(b"README.rst.\n"),
         ]
 
         rc = md5hasher.check_hash("foo", args)
@@ -158,7 +165,7 @@ class TestMD5Hasher:
         _open.side_effect = [
             io.StringIO(self.check_data),
             IOError,
-            io.StringIO("README.rst\n"),
+            io.BytesIO(b"README.rst\n"),
         ]
 
         rc = md5hasher.check_hash("foo", args)
@@ -199,8 +206,8 @@ class TestMD5Hasher:
         _open = mocker.patch("hasher.hashes.open", mocker.mock_open())
         _open.side_effect = [
             io.StringIO(self.check_data),
-            io.StringIO("AUTHORS\n"),
-            io.StringIO("README.rst\n"),
+            io.BytesIO(b"AUTHORS\n"),
+            io.BytesIO(b"README.rst\n"),
         ]
 
         args.quiet = True
@@ -216,8 +223,8 @@ class TestMD5Hasher:
         _open = mocker.patch("hasher.hashes.open", mocker.mock_open())
         _open.side_effect = [
             io.StringIO(self.check_data),
-            io.StringIO("AUTHORS\n"),
-            io.StringIO("README.rst\n"),
+            io.BytesIO(b"AUTHORS\n"),
+            io.BytesIO(b"README.rst\n"),
         ]
 
         args.status = True
@@ -233,8 +240,8 @@ class TestMD5Hasher:
         _open = mocker.patch("hasher.hashes.open", mocker.mock_open())
         _open.side_effect = [
             io.StringIO(self.check_data),
-            io.StringIO("AUTHORS\n"),
-            io.StringIO("AUTHORS\n"),
+            io.BytesIO(b"AUTHORS\n"),
+            io.BytesIO(b"AUTHORS\n"),
         ]
 
         args.status = True
@@ -250,7 +257,7 @@ class TestMD5Hasher:
         _open = mocker.patch("hasher.hashes.open", mocker.mock_open())
         _open.side_effect = [
             io.StringIO(self.check_data),
-            io.StringIO("AUTHORS\n"),
+            io.BytesIO(b"AUTHORS\n"),
             IOError,
         ]
 
@@ -269,8 +276,8 @@ class TestMD5Hasher:
         _open = mocker.patch("hasher.hashes.open", mocker.mock_open())
         _open.side_effect = [
             io.StringIO(self.check_data),
-            io.StringIO("AUTHORS\n"),
-            io.StringIO("README.rst\n"),
+            io.BytesIO(b"AUTHORS\n"),
+            io.BytesIO(b"README.rst\n"),
         ]
 
         args.warn = True
@@ -290,7 +297,7 @@ class TestMD5Hasher:
                 "3ac11b17fa463072f069580031317af2  AUTHORS\n"
                 "4e6ee384b7a0a002681cda43a5ccc9d0 +README.rst\n"
             ),
-            io.StringIO("AUTHORS\n"),
+            io.BytesIO(b"AUTHORS\n"),
         ]
 
         args.warn = True
@@ -304,3 +311,303 @@ class TestMD5Hasher:
         ]
         assert expected_stderr_calls == md5hasher.stderr.call_args_list
         assert rc == 1
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 64 * 2048])
+    def test_iterchunks_readinto(self, md5hasher, chunk_size):
+        md5hasher.chunk_size = chunk_size
+        data = self.data.encode("utf-8") * 100
+
+        chunks = [bytes(chunk) for chunk in md5hasher.iterchunks(io.BytesIO(data))]
+
+        assert data == b"".join(chunks)
+        assert all(len(chunk) <= chunk_size for chunk in chunks)
+        assert md5hasher._calculate_hash(io.BytesIO(data)) == (
+            hashlib.md5(data).hexdigest()
+        )
+
+    @pytest.mark.parametrize("size", [0, 10, 100, 1000])
+    def test_calculate_hash_mmap(self, md5hasher, tmp_path, size):
+        data = bytes(range(256)) * size
+        path = tmp_path / "data.bin"
+        path.write_bytes(data)
+        md5hasher.chunk_size = 4096
+        md5hasher.use_mmap = True
+
+        with open(path, "rb") as fobj:
+            assert md5hasher._calculate_hash(fobj) == hashlib.md5(data).hexdigest()
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 64 * 2048])
+    def test_calculate_hash_text(self, md5hasher, chunk_size):
+        from hasher.hashes import NewlineReader
+
+        md5hasher.chunk_size = chunk_size
+        data = b"a\r\nb\rc\n\r\r\n\n\xff\xfe\r"
+        expected = b"a\nb\nc\n\n\n\n\xff\xfe\n"
+
+        reader = NewlineReader(io.BytesIO(data))
+        assert expected == b"".join(md5hasher.iterchunks(reader))
+        assert md5hasher._calculate_hash(NewlineReader(io.BytesIO(data))) == (
+            hashlib.md5(expected).hexdigest()
+        )
+
+    def test_parse_check_file_blocks(self, mocker, md5hasher):
+        mocker.patch("hasher.hashes.MANIFEST_BLOCK_SIZE", 7)
+        data = (
+            self.check_data
+            + "\n"
+            + "1234  File\n"
+            + "3AC11B17FA463072F069580031317AF2  AUTHORS\n"
+            + "3ac11b17fa463072f069580031317af2 +AUTHORS\n"
+            + "3ac11b17fa463072f069580031317af2  \n"
+            + "3ac11b17fa463072f069580031317af2 * spaced name \r\n"
+            + "3ac11b17fa463072f06958003131zaf2  AUTHORS\n"
+            + "3ac11b17fa463072f069580031317af2 *last"
+        )
+
+        text = list(md5hasher._parse_check_file(io.StringIO(data)))
+        binary = list(md5hasher._parse_check_file(io.BytesIO(data.encode("utf-8"))))
+
+        assert text == binary
+        assert [0, 1, 7, 9] == [idx for idx, record in binary if record is not None]
+        assert (
+            bytes.fromhex("3ac11b17fa463072f069580031317af2"),
+            True,
+            " spaced name",
+        ) == binary[7][1]
+
+
+def merkle_root(leaves):
+    """RFC 6962 Merkle tree hash, as a reference for TreeHasher."""
+    if len(leaves) == 1:
+        return hashlib.sha256(b"\x00" + leaves[0]).digest()
+    k = 1
+    while 2 * k < len(leaves):
+        k *= 2
+    return hashlib.sha256(
+        b"\x01" + merkle_root(leaves[:k]) + merkle_root(leaves[k:])
+    ).digest()
+
+
+class TestSHA256TreeHasher:
+    @pytest.fixture
+    def treehasher(self, mocker):
+        from hasher import hashes
+
+        treehasher = hashes.SHA256TreeHasher(
+            mocker.MagicMock(name="stdout"), mocker.MagicMock(name="stderr")
+        )
+        treehasher.leaf_size = 4
+        return treehasher
+
+    @pytest.mark.parametrize("jobs", [1, 3])
+    @pytest.mark.parametrize("size", [0, 1, 4, 8, 9, 20, 28, 32, 33])
+    def test_calculate_hash(self, treehasher, tmp_path, size, jobs):
+        from concurrent.futures import ThreadPoolExecutor
+
+        data = bytes(range(size))
+        leaves = [data[i : i + 4] for i in range(0, size, 4)] or [b""]
+        expected = merkle_root(leaves).hex()
+        path = tmp_path / "data.bin"
+        path.write_bytes(data)
+
+        assert expected == treehasher._calculate_hash(io.BytesIO(data))
+        with ThreadPoolExecutor(max_workers=jobs) as pool, open(path, "rb") as fobj:
+            if jobs > 1:
+                treehasher.leaf_executor = pool
+                treehasher.leaf_jobs = jobs
+            assert expected == treehasher._calculate_hash(fobj)
+
+    def test_parse_check_file(self, treehasher):
+        digest = "ab" * 32
+        data = (
+            f"SHA256-TREE (foo) = {digest}\n"
+            f"SHA256 (foo) = {digest}\n"
+            f"{digest}  foo\n"
+            f"SHA256-TREE (a (b)) = {digest}\r\n"
+        )
+
+        assert [
+            (0, (bytes.fromhex(digest), True, "foo")),
+            (1, None),
+            (2, None),
+            (3, (bytes.fromhex(digest), True, "a (b)")),
+        ] == list(treehasher._parse_check_file(io.BytesIO(data.encode("utf-8"))))
+
+
+def test_load_plugins(mocker):
+    from hasher import hashes
+
+    class CRCHasher(hashes.Hasher):
+        name = "crc"
+        hashlib = hashlib.md5
+
+    good = mocker.MagicMock()
+    good.load.return_value = CRCHasher
+    bad = mocker.MagicMock()
+    bad.load.side_effect = ImportError
+    wrong = mocker.MagicMock()
+    wrong.load.return_value = object
+    entry_points = mocker.patch(
+        "importlib.metadata.entry_points", return_value=[bad, wrong, good]
+    )
+    mocker.patch.dict(hashes.HASHERS)
+
+    hashes.load_plugins()
+
+    entry_points.assert_called_once_with(group="hasher.hashers")
+    assert CRCHasher is hashes.HASHERS["crc"]
+    assert object not in hashes.HASHERS.values()
+    assert r"^([a-f0-9]{32}) (\*| )(.+)$" == CRCHasher.CHECK_RE.pattern
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_hooks(md5hasher, tmp_path, jobs):
+    from hasher.args import Args
+
+    data = b"some data\n" * 1000
+    (tmp_path / "a").write_bytes(data)
+    (tmp_path / "b").write_bytes(b"")
+    files = [str(tmp_path / name) for name in ("a", "b", "missing")]
+    calls = []
+    md5hasher.add_hook(lambda fname, file_stats: calls.append((fname, file_stats)))
+
+    md5hasher.take_action(
+        Args(files, False, True, False, False, False, False, False, jobs=jobs)
+    )
+
+    assert files == [fname for fname, _ in calls]
+    stats = [file_stats for _, file_stats in calls]
+    assert [len(data), 0, 0] == [file_stats.bytes for file_stats in stats]
+    assert [False, False, True] == [file_stats.error for file_stats in stats]
+    assert all(file_stats.open_ns > 0 for file_stats in stats)
+    assert stats[0].read_ns > 0
+    assert stats[0].hash_ns > 0
+
+
+def test_hash_files_and_verify(md5hasher, tmp_path):
+    from hasher.hashes import FORMAT_ERROR, HASH_ERROR, READ_ERROR, SUCCESS
+
+    (tmp_path / "a").write_bytes(b"a\r\n")
+    (tmp_path / "b").write_bytes(b"b")
+    files = [str(tmp_path / name) for name in ("a", "b", "missing")]
+
+    results = list(md5hasher.hash_files(files, binary=True))
+
+    assert files == [result.path for result in results]
+    assert [SUCCESS, SUCCESS, READ_ERROR] == [result.status for result in results]
+    assert hashlib.md5(b"a\r\n").digest() == results[0].digest
+    assert isinstance(results[2].error, FileNotFoundError)
+    assert {"md5"} == {result.algorithm for result in results}
+    assert not md5hasher.stdout.called
+
+    text = hashlib.md5(b"a\n").hexdigest()
+    sums = tmp_path / "SUMS"
+    sums.write_text(
+        f"{text}  {files[0]}\n"
+        "not a checksum line\n"
+        f"{results[0].hexdigest}  {files[1]}\n"
+        f"{results[0].hexdigest} *{files[2]}\n"
+    )
+
+    results = list(md5hasher.verify(str(sums)))
+
+    assert [SUCCESS, FORMAT_ERROR, HASH_ERROR, READ_ERROR] == [
+        result.status for result in results
+    ]
+    assert [1, 2, 3, 4] == [result.line for result in results]
+    assert str(sums) == results[1].path
+    assert hashlib.md5(b"b").digest() == results[2].digest
+    assert hashlib.md5(b"a\r\n").digest() == results[2].expected
+    assert results[3].binary
+    assert isinstance(results[3].error, FileNotFoundError)
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_verify_read_order(md5hasher, tmp_path, mocker, jobs):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from hasher.hashes import FORMAT_ERROR, HASH_ERROR, READ_ERROR, SUCCESS
+
+    names = ["a", "b", "c", "d"]
+    for name in names:
+        (tmp_path / name).write_text(name)
+    files = [str(tmp_path / name) for name in names]
+    digests = [hashlib.md5(name.encode()).hexdigest() for name in names]
+    sums = tmp_path / "SUMS"
+    sums.write_text(
+        f"{digests[0]}  {files[0]}\n"
+        f"{digests[0]}  {files[1]}\n"
+        "not a checksum line\n"
+        f"{digests[2]}  {tmp_path / 'missing'}\n"
+        f"{digests[2]}  {files[2]}\n"
+        f"{digests[3]}  {files[3]}\n"
+    )
+    # schedule the files in reverse
+    mocker.patch(
+        "hasher.hashes.read_key",
+        side_effect=lambda order, path: (
+            (0, 0, -files.index(path), 0) if path in files else (-1, -1, -1, -1)
+        ),
+    )
+    read = []
+    hash_path = md5hasher._try_hash_path
+    mocker.patch.object(
+        md5hasher,
+        "_try_hash_path",
+        side_effect=lambda path, binary: read.append(path) or hash_path(path, binary),
+    )
+    if jobs > 1:
+        md5hasher.jobs = jobs
+        md5hasher.executor = ThreadPoolExecutor(max_workers=jobs)
+
+    try:
+        results = list(md5hasher.verify(str(sums), order="inode"))
+    finally:
+        md5hasher._close()
+
+    assert [str(tmp_path / "missing")] + files[::-1] == read
+    assert [SUCCESS, HASH_ERROR, FORMAT_ERROR, READ_ERROR, SUCCESS, SUCCESS] == [
+        result.status for result in results
+    ]
+    assert [1, 2, 3, 4, 5, 6] == [result.line for result in results]
+
+
+def test_check_hash_resume(md5hasher, args, tmp_path, mocker):
+    from hasher.checkpoint import Checkpoint
+    from hasher.hashes import MD5Hasher
+
+    names = ["a", "b", "c", "d"]
+    for name in names:
+        (tmp_path / name).write_text(name)
+    sums = tmp_path / "SUMS"
+    sums.write_text(
+        f"{hashlib.md5(b'a').hexdigest()}  {tmp_path / 'a'}\n"
+        f"{hashlib.md5(b'x').hexdigest()}  {tmp_path / 'b'}\n"
+        "not a checksum line\n"
+        f"{hashlib.md5(b'c').hexdigest()}  {tmp_path / 'c'}\n"
+        f"{hashlib.md5(b'x').hexdigest()}  {tmp_path / 'd'}\n"
+    )
+    path = str(tmp_path / "checkpoint")
+
+    assert 1 == md5hasher.check_hash(str(sums), args)
+    expected = md5hasher.stderr.call_args_list
+
+    # interrupted while writing the result of the fourth line
+    interrupted = MD5Hasher(mocker.MagicMock(), mocker.MagicMock())
+    interrupted.stdout.side_effect = [None, None, KeyboardInterrupt]
+    interrupted.checkpoint = Checkpoint(path, "md5")
+    with pytest.raises(KeyboardInterrupt):
+        interrupted.check_hash(str(sums), args)
+
+    resumed = MD5Hasher(mocker.MagicMock(), mocker.MagicMock())
+    resumed.checkpoint = Checkpoint(path, "md5", resume=True)
+    assert 1 == resumed.check_hash(str(sums), args)
+    assert [
+        mocker.call(f"{tmp_path / name}: {status}")
+        for name, status in [
+            ("c", "OK"),
+            ("d", "FAILED"),
+        ]
+    ] == resumed.stdout.call_args_list
+    # the summary counts the errors found before the interruption
+    assert expected[-2:] == resumed.stderr.call_args_list
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import os
+
+from hasher.layout import FIRST, physical_offset, read_key, resequence
+
+
+def test_resequence():
+    items = [(2, "c"), (0, "a"), (3, "d"), (1, "b"), (4, "e")]
+    assert ["a", "b", "c", "d", "e"] == list(resequence(items))
+
+
+def test_resequence_is_lazy():
+    results = resequence(iter([(0, "a"), (2, "c"), (1, "b")]))
+    assert "a" == next(results)
+    assert ["b", "c"] == list(results)
+
+
+def test_read_key(tmp_path):
+    path = tmp_path / "a"
+    path.write_bytes(b"a" * 8192)
+    st = os.stat(path)
+
+    assert (st.st_dev, 0, st.st_ino, st.st_ino) == read_key("inode", str(path))
+    dev, _, offset, ino = read_key("extent", str(path))
+    assert (st.st_dev, st.st_ino) == (dev, ino)
+    assert offset >= 0
+    assert FIRST == read_key("inode", str(tmp_path / "missing"))
+    assert FIRST == read_key("extent", str(tmp_path / "missing"))
+    assert FIRST < read_key("inode", str(path))
+
+
+def test_read_key_without_extent(tmp_path, mocker):
+    mapped, empty = tmp_path / "a", tmp_path / "b"
+    mapped.write_bytes(b"a" * 8192)
+    empty.touch()
+    st = os.stat(empty)
+    # an offset past the inode number of the empty file
+    mocker.patch(
+        "hasher.layout.physical_offset",
+        side_effect=lambda fd: st.st_ino + 1 if os.fstat(fd).st_size else None,
+    )
+
+    assert (st.st_dev, 1, st.st_ino, st.st_ino) == read_key("extent", str(empty))
+    assert read_key("extent", str(mapped)) < read_key("extent", str(empty))
+
+
+def test_physical_offset_empty(tmp_path):
+    path = tmp_path / "empty"
+    path.touch()
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        # an empty file has no extents, whether or not the filesystem maps them
+        assert physical_offset(fd) is None
+    finally:
+        os.close(fd)
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import io
+import time
+
+from hasher.output import BufferedWriter
+
+
+def test_buffered_writer_size():
+    stream = io.StringIO()
+    writer = BufferedWriter(stream, size=10, interval=0)
+
+    writer("12345")
+    assert "" == stream.getvalue()
+    writer("6789")
+    assert "12345\n6789\n" == stream.getvalue()
+    writer("abc", nl=False)
+    writer.close()
+    assert "12345\n6789\nabc" == stream.getvalue()
+
+
+def test_buffered_writer_interval():
+    stream = io.StringIO()
+    writer = BufferedWriter(stream, interval=0.01)
+
+    writer("line")
+    for _ in range(100):
+        if stream.getvalue():
+            break
+        time.sleep(0.01)
+    assert "line\n" == stream.getvalue()
+    writer.close()
+
+
+def test_buffered_writer_ordering():
+    stream = io.StringIO()
+    other = io.StringIO()
+    order = []
+    writer = BufferedWriter(stream, interval=0)
+    stderr = writer.flushing(lambda message: order.append(stream.getvalue()))
+
+    writer("first")
+    stderr("error")
+    writer("second", file=other)
+    writer("third")
+
+    assert ["first\n"] == order
+    assert "second\n" == other.getvalue()
+    assert "first\n" == stream.getvalue()
+    with writer:
+        pass
+    assert "first\nthird\n" == stream.getvalue()
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import io
+import os
+
+import pytest
+
+from hasher import pagecache
+from hasher.pagecache import DIRECT_ALIGN, direct_chunks, dropping, regular_fd
+
+
+@pytest.mark.parametrize("size", [0, 1, DIRECT_ALIGN, 3 * DIRECT_ALIGN + 5])
+def test_direct_chunks(tmp_path, size):
+    path = tmp_path / "data"
+    data = os.urandom(size)
+    path.write_bytes(data)
+
+    with open(path, "rb") as fobj:
+        chunks = [bytes(chunk) for chunk in direct_chunks(fobj.fileno(), 1000)]
+        assert data == b"".join(chunks)
+        assert all(len(chunk) <= DIRECT_ALIGN for chunk in chunks)
+        # O_DIRECT is turned off again
+        if pagecache.O_DIRECT:
+            import fcntl
+
+            flags = fcntl.fcntl(fobj.fileno(), fcntl.F_GETFL)
+            assert not flags & pagecache.O_DIRECT
+
+
+def test_direct_chunks_offset(tmp_path):
+    path = tmp_path / "data"
+    data = os.urandom(3 * DIRECT_ALIGN)
+    path.write_bytes(data)
+
+    with open(path, "rb") as fobj:
+        chunks = direct_chunks(fobj.fileno(), DIRECT_ALIGN, DIRECT_ALIGN)
+        assert data[DIRECT_ALIGN:] == b"".join(bytes(chunk) for chunk in chunks)
+
+
+def test_dropping(mocker, monkeypatch):
+    monkeypatch.setattr(pagecache, "DROP_BYTES", 4)
+    advise = mocker.patch("hasher.pagecache.advise")
+
+    chunks = dropping([b"abc", b"def", b"gh"], 7, offset=10)
+    assert b"abc" == next(chunks)
+    assert not advise.called
+    assert [b"def", b"gh"] == list(chunks)
+
+    assert [
+        mocker.call(7, "DONTNEED", 10, 6),
+        mocker.call(7, "DONTNEED"),
+    ] == advise.call_args_list
+
+
+def test_regular_fd(tmp_path):
+    path = tmp_path / "data"
+    path.write_bytes(b"data")
+
+    with open(path, "rb") as fobj:
+        assert fobj.fileno() == regular_fd(fobj)
+    assert regular_fd(io.BytesIO(b"data")) is None
+    r, w = os.pipe()
+    try:
+        with open(r, "rb") as fobj:
+            assert regular_fd(fobj) is None
+    finally:
+        os.close(w)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from hasher.progress import Progress
+from hasher.stats import FileStats
+
+
+def test_progress(mocker):
+    clock = mocker.patch("hasher.progress.time.monotonic", return_value=100.0)
+    lines = []
+    progress = Progress(lines.append, interval=1.0)
+    progress.total_files, progress.total_bytes = 3, 4_000_000
+
+    progress.add(1_000_000)
+    assert [] == lines
+
+    clock.return_value = 101.0
+    progress("a", FileStats(bytes=2_000_000, reported=1_000_000))
+    assert ["2.0 MB, 1/3 files, 2.0 MB/s, 0:00:01 elapsed, ETA 0:00:01"] == lines
+
+    clock.return_value = 101.2
+    progress("b", FileStats(bytes=1_000_000))
+    assert 1 == len(lines)
+
+    clock.return_value = 102.0
+    progress.close()
+    assert "3.0 MB, 2/3 files, 1.5 MB/s, 0:00:02 elapsed, ETA 0:00:00" == lines[-1]
+
+
+def test_progress_rewrite(mocker):
+    mocker.patch("hasher.progress.time.monotonic", return_value=0.0)
+    lines = []
+    progress = Progress(lines.append, rewrite=True)
+    progress.close()
+    assert ["\r0.0 MB, 0 files, 0.0 MB/s, 0:00:00 elapsed\x1b[K", "\n"] == lines
+
+
+def test_progress_size():
+    progress = Progress(lambda line: None)
+    progress.size(iter([1, 2, 3])).join()
+    assert (3, 6) == (progress.total_files, progress.total_bytes)
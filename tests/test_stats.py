@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import json
+
+from hasher.stats import FileStats, Stats
+
+
+def test_stats_totals():
+    stats = Stats("md5", slowest=2)
+    stats("a", FileStats(open_ns=1, read_ns=10, hash_ns=100, output_ns=5, bytes=3))
+    stats("b", FileStats(open_ns=2, read_ns=20, hash_ns=300, bytes=4))
+    stats("c", FileStats(open_ns=3, error=True))
+
+    summary = stats.summary()
+    assert "md5" == summary["hasher"]
+    assert 3 == summary["files"]
+    assert 1 == summary["errors"]
+    assert 7 == summary["bytes"]
+    assert {"open": 6e-9, "read": 30e-9, "hash": 400e-9, "output": 5e-9} == (
+        summary["seconds"]
+    )
+    assert ["b", "a"] == [item["path"] for item in summary["slowest"]]
+
+
+def test_stats_format():
+    stats = Stats("sha1")
+    stats("a", FileStats(read_ns=10**9, bytes=10**6))
+
+    assert stats.summary()["files"] == json.loads(stats.format("json"))["files"]
+    lines = stats.format("text").splitlines()
+    assert lines[0].startswith("hasher sha1: 1 files (0 failed), 1000000 bytes in ")
+    assert "hasher sha1: read        1.000s" == lines[2]
+    assert lines[-1].endswith("s a")
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+import pickle
+import threading
+import time
+
+import pytest
+
+from hasher.throttle import TokenBucket
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        with self.lock:
+            self.now += seconds
+
+
+def test_take():
+    clock = FakeClock()
+    bucket = TokenBucket(100, burst=10, clock=clock, sleep=clock.sleep)
+
+    bucket.take(10)
+    assert 0 == clock.now
+    bucket.take(50)
+    assert pytest.approx(0.5) == clock.now
+    # a pause only allows a burst
+    clock.now += 10
+    bucket.take(10)
+    bucket.take(100)
+    assert pytest.approx(11.5) == clock.now
+
+
+def test_throttle():
+    clock = FakeClock()
+    bucket = TokenBucket(1000, burst=1, clock=clock, sleep=clock.sleep)
+
+    chunks = [b"a" * 500, b"b" * 250, b"c"]
+    assert chunks == list(bucket.throttle(chunks))
+    assert pytest.approx(0.75) == clock.now
+
+
+def test_threads():
+    bucket = TokenBucket(200, burst=1)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(bucket.take, [10] * 8))
+    # 79 tokens over the burst at 200 per second, shared by all threads
+    assert time.monotonic() - start >= 0.35
+
+
+def test_pickle():
+    bucket = TokenBucket(1000, burst=100, shares=4)
+
+    copy = pickle.loads(pickle.dumps(bucket))
+    assert (250, 25) == (copy.rate, copy.burst)
+    # every task sent to a worker process uses the same bucket
+    assert copy is pickle.loads(pickle.dumps(bucket))
+    # but not a bucket that happens to have the same rate
+    other = TokenBucket(1000, burst=100, shares=4)
+    assert copy is not pickle.loads(pickle.dumps(other))
+
+
+def test_invalid_rate():
+    with pytest.raises(RuntimeError):
+        TokenBucket(0)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import io
+import os
+
+import pytest
+
+from hasher.walk import read_paths, walk
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in ("b.txt", "a.py", "sub/c.txt", "sub/deep/d.txt", "skip/e.txt"):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(name)
+    os.symlink(tmp_path / "sub", tmp_path / "link")
+    return tmp_path
+
+
+def relative(paths, top):
+    return [os.path.relpath(path, top) for path in paths]
+
+
+def test_walk_sorted(tree):
+    assert [
+        "a.py",
+        "b.txt",
+        "skip/e.txt",
+        "sub/c.txt",
+        "sub/deep/d.txt",
+    ] == relative(walk([str(tree)]), tree)
+
+
+def test_walk_unsorted(tree):
+    assert sorted(relative(walk([str(tree)]), tree)) == sorted(
+        relative(walk([str(tree)], sort=False), tree)
+    )
+
+
+def test_walk_files_and_stdin(tree):
+    paths = list(walk(["-", str(tree / "b.txt"), str(tree / "sub" / "deep")]))
+    assert "-" == paths[0]
+    assert ["b.txt", "sub/deep/d.txt"] == relative(paths[1:], tree)
+
+
+def test_walk_include_exclude(tree):
+    paths = walk([str(tree)], include=["*.txt"], exclude=["skip", "sub/deep/*"])
+    assert ["b.txt", "sub/c.txt"] == relative(paths, tree)
+
+
+def test_walk_onerror(tree):
+    errors = []
+    os.chmod(tree / "sub", 0)
+    try:
+        if os.access(tree / "sub", os.R_OK):
+            pytest.skip("directory permissions are not enforced")
+        list(walk([str(tree)], onerror=errors.append))
+    finally:
+        os.chmod(tree / "sub", 0o755)
+    assert [str(tree / "sub")] == [e.filename for e in errors]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1024])
+@pytest.mark.parametrize("null", [False, True])
+def test_read_paths(chunk_size, null):
+    sep = "\0" if null else "\n"
+    data = sep.join(["a.txt", "", "dir/b c.txt", "d\udcff"]) + sep
+    fobj = io.BytesIO(os.fsencode(data))
+
+    assert ["a.txt", "dir/b c.txt", "d\udcff"] == list(
+        read_paths(fobj, null=null, chunk_size=chunk_size)
+    )